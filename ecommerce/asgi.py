@@ -3,6 +3,9 @@ ASGI config for ecommerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module (e.g. ``uvicorn ecommerce.asgi:application``)
+so the async chatbot views stream answers without tying up a worker per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
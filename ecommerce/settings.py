@@ -20,8 +20,6 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-print(f"✅ Loaded OpenAI Key: {OPENAI_API_KEY}")
-print(f"✅ Loaded Gemini Key: {GEMINI_API_KEY}")
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shop.querybudget.QueryBudgetMiddleware',  # ✅ Logs views that blow their query budget
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -97,6 +96,23 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # ✅ Generated AI text, keyed by a hash of model + prompt + params
+    'ai': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'ai'),
+        'TIMEOUT': 60 * 60 * 24 * 7,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -143,6 +159,29 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# AI resources (NLTK lexicons, Hugging Face weights) are resolved lazily from here;
+# run `python manage.py warmup` to fetch and pre-load them.
+AI_RESOURCE_DIR = os.path.join(BASE_DIR, "resources")
+AI_OFFLINE = os.getenv("AI_OFFLINE", "") == "1"
+
+# Feedback sentiment: "vader" (lexicon, fast) or "transformer" (needs torch; see SENTIMENT_MODEL).
+# Compare them with `python manage.py benchmark_sentiment`.
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "vader")
+SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", "0")) or None
+
+# Per-view SQL budgets (URL name -> max queries, session and auth lookups included).
+# Violations and repeated statements (likely N+1) are logged by shop.querybudget.
+QUERY_BUDGETS = {
+    "product_list": 9,  # 5 when the search ranking is cached; a miss adds corpus stats, term counts and ranking
+    "product_detail": 4,
+    "view_feedback": 4,
+    "purchase_history": 4,
+    "purchase_details": 5,
+    "cart_detail": 10,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_REPEATS = 5
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',  # Default username authentication
 ]
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+AI_CACHE_ALIAS = getattr(settings, "AI_CACHE_ALIAS", "ai")
+
+
+class ResultCache:
+    """Content-addressed cache for AI generations.
+
+    Keys are a hash of (model, prompt, generation params), so any change to
+    the model or parameters naturally misses. Entries live in the Django
+    cache alias ``AI_CACHE_ALIAS`` (shared and persistent) with a small
+    in-process LRU in front of it for repeat hits.
+    """
+
+    def __init__(self, namespace, timeout=None, local_size=256):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local_size = local_size
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "local_hits": 0, "misses": 0}
+
+    def key(self, model, prompt, params=None):
+        payload = json.dumps([model, prompt, params or {}], sort_keys=True)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def get(self, model, prompt, params=None):
+        """Cached result for the inputs, or None on a miss."""
+        key = self.key(model, prompt, params)
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                self._counts["hits"] += 1
+                self._counts["local_hits"] += 1
+                return entry[1]
+
+        value = caches[AI_CACHE_ALIAS].get(key)
+        with self._lock:
+            if value is None:
+                self._counts["misses"] += 1
+                return None
+            self._counts["hits"] += 1
+        self._remember(key, value)
+        return value
+
+    def set(self, model, prompt, value, params=None):
+        key = self.key(model, prompt, params)
+        caches[AI_CACHE_ALIAS].set(key, value, self._backend_timeout())
+        self._remember(key, value)
+
+    def get_or_compute(self, model, prompt, compute, params=None):
+        """Return the cached result, calling ``compute()`` and storing it on a miss."""
+        value = self.get(model, prompt, params)
+        if value is None:
+            value = compute()
+            self.set(model, prompt, value, params)
+        return value
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "hit_rate": self._counts["hits"] / lookups if lookups else 0.0,
+                "local_entries": len(self._local),
+            }
+
+    def _backend_timeout(self):
+        # ✅ None means "use the cache alias's own TIMEOUT"
+        if self.timeout is None:
+            return caches[AI_CACHE_ALIAS].default_timeout
+        return self.timeout
+
+    def _remember(self, key, value):
+        ttl = self._backend_timeout()
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._local[key] = (expires_at, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+
+description_cache = ResultCache("description")
@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module
+    resource = None
+
+from django.conf import settings
+
+DESCRIPTION_MODEL = getattr(settings, "DESCRIPTION_MODEL", "gpt2")
+SENTIMENT_BACKEND = getattr(settings, "SENTIMENT_BACKEND", "vader")
+SENTIMENT_MODEL = getattr(settings, "SENTIMENT_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+SENTIMENT_THREADS = getattr(settings, "SENTIMENT_THREADS", None)  # torch intra-op threads (None: torch default)
+SENTIMENT_QUANTIZE = getattr(settings, "SENTIMENT_QUANTIZE", True)
+
+# ✅ Local directory for NLTK data and Hugging Face weights, so nothing is fetched at import
+AI_RESOURCE_DIR = str(getattr(settings, "AI_RESOURCE_DIR", os.path.join(settings.BASE_DIR, "resources")))
+AI_OFFLINE = getattr(settings, "AI_OFFLINE", False)
+
+
+class ModelRegistry:
+    """Process-wide registry that loads heavy AI models lazily and shares them."""
+
+    def __init__(self):
+        self._loaders = {}
+        self._warm_by_default = set()
+        self._instances = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, warm=True):
+        """Register a zero-argument loader under ``name`` (nothing is loaded yet).
+
+        ``warm=False`` keeps optional models out of ``warm()`` unless named.
+        """
+        self._loaders[name] = loader
+        if warm:
+            self._warm_by_default.add(name)
+        else:
+            self._warm_by_default.discard(name)
+
+    def get(self, name):
+        """Return the shared instance for ``name``, loading it on first use."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            # ✅ Another thread may have finished loading while we waited
+            if name not in self._instances:
+                self._instances[name] = self._load(name)
+            return self._instances[name]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def warm(self, names=None):
+        """Eagerly load the given models (every model registered with ``warm=True`` by default)."""
+        for name in names or [name for name in self._loaders if name in self._warm_by_default]:
+            self.get(name)
+        return self.stats()
+
+    def unload(self, name):
+        with self._lock:
+            self._instances.pop(name, None)
+            self._stats.pop(name, None)
+
+    def stats(self):
+        """Load time and memory footprint for every registered model."""
+        return {
+            name: {"loaded": name in self._instances, **self._stats.get(name, {})}
+            for name in self._loaders
+        }
+
+    def _load(self, name):
+        try:
+            loader = self._loaders[name]
+        except KeyError:
+            raise KeyError(f"No model registered under '{name}'.") from None
+
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        instance = loader()
+        load_seconds = time.perf_counter() - started
+
+        memory_bytes = _parameter_bytes(instance)
+        if memory_bytes is None:
+            memory_bytes = max(_rss_bytes() - rss_before, 0)
+
+        self._stats[name] = {"load_seconds": load_seconds, "memory_bytes": memory_bytes}
+        return instance
+
+
+def _rss_bytes():
+    """Current resident set size of this process.
+
+    Read from ``/proc/self/statm`` where there is one; elsewhere falls back to
+    the peak RSS (ru_maxrss is bytes on macOS), which under-reports a model
+    loaded after an earlier, larger allocation was freed.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _parameter_bytes(instance):
+    """Size of the model weights behind a transformers pipeline, if it exposes them."""
+    model = getattr(instance, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return None
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def ensure_nltk_resource(path, package):
+    """Find an NLTK resource in ``AI_RESOURCE_DIR``, downloading it there only if missing."""
+    import nltk
+
+    nltk_dir = os.path.join(AI_RESOURCE_DIR, "nltk_data")
+    if nltk_dir not in nltk.data.path:
+        nltk.data.path.insert(0, nltk_dir)
+    try:
+        nltk.data.find(path)
+    except LookupError:
+        if AI_OFFLINE:
+            raise
+        nltk.download(package, download_dir=nltk_dir, quiet=True)
+
+
+def _configure_huggingface():
+    # ✅ Must be set before transformers is first imported
+    os.environ.setdefault("HF_HOME", os.path.join(AI_RESOURCE_DIR, "huggingface"))
+    if AI_OFFLINE:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+
+def _load_description_pipeline():
+    _configure_huggingface()
+    from transformers import pipeline
+
+    return pipeline("text-generation", model=DESCRIPTION_MODEL)
+
+
+def _load_vader():
+    ensure_nltk_resource("sentiment/vader_lexicon.zip", "vader_lexicon")
+    from nltk.sentiment import SentimentIntensityAnalyzer
+
+    return SentimentIntensityAnalyzer()
+
+
+def _load_sentiment_pipeline():
+    """Transformer sentiment classifier on CPU, int8-quantized where the platform supports it."""
+    _configure_huggingface()
+    import torch
+    from transformers import pipeline
+
+    if SENTIMENT_THREADS:
+        torch.set_num_threads(SENTIMENT_THREADS)
+    classifier = pipeline("sentiment-analysis", model=SENTIMENT_MODEL, device=-1)
+    if SENTIMENT_QUANTIZE:
+        try:
+            # ✅ Dynamic int8 quantization of the Linear layers: smaller weights, faster CPU matmuls
+            classifier.model = torch.quantization.quantize_dynamic(
+                classifier.model, {torch.nn.Linear}, dtype=torch.qint8)
+        except (AttributeError, RuntimeError):
+            pass  # No quantized kernels for this CPU/build; keep float weights
+    return classifier
+
+
+def _load_chatbot_backend():
+    from .chatbot import get_backend
+
+    return get_backend()
+
+
+registry = ModelRegistry()
+registry.register("description", _load_description_pipeline)
+registry.register("vader", _load_vader)
+registry.register("chatbot", _load_chatbot_backend)
+registry.register("sentiment-transformer", _load_sentiment_pipeline, warm=SENTIMENT_BACKEND == "transformer")
+
+
+def get_description_generator():
+    """Shared text-generation pipeline used for product descriptions."""
+    return registry.get("description")
@@ -0,0 +1,261 @@
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Product
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_MAX_PRODUCTS = getattr(settings, "AUTOCOMPLETE_MAX_PRODUCTS", 100_000)
+AUTOCOMPLETE_MAX_AGE = getattr(settings, "AUTOCOMPLETE_MAX_AGE", 300)
+
+MAX_TERM_LENGTH = 32
+MAX_EXPANSIONS = 50  # Index terms considered per query token
+MAX_FUZZY_CHECKS = 64  # Edit-distance checks per query token
+
+
+def _grams(term):
+    """Trigrams of a term, the first one anchored at its start (``$sp``, ``spe``, ``pea`` ...)."""
+    padded = "$" + term
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query, term, max_distance):
+    """Smallest edit distance between ``query`` and any prefix of ``term``.
+
+    Returns ``max_distance + 1`` as soon as every cell of a DP row exceeds the
+    bound, so most non-matching candidates are rejected after a few characters.
+    """
+    term = term[:len(query) + max_distance]
+    previous = list(range(len(query) + 1))
+    best = previous[-1]
+    for k, char in enumerate(term, start=1):
+        current = [k]
+        for j, q in enumerate(query, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (q != char)))
+        if min(current) > max_distance:
+            break
+        best = min(best, current[-1])
+        previous = current
+    return best
+
+
+class AutocompleteIndex:
+    """In-memory prefix and trigram index over product titles and codes.
+
+    Prefixes are answered from a sorted term list with ``bisect``; when a
+    token has too few prefix hits, the terms sharing the most trigrams with
+    it are checked for a prefix within edit distance 1 (short tokens) or 2.
+    At most ``max_products`` products are held; ``stats()`` reports the
+    footprint.
+    """
+
+    def __init__(self, max_products=AUTOCOMPLETE_MAX_PRODUCTS):
+        self.max_products = max_products
+        self.built_at = None
+        self.dropped = 0
+        self._lock = threading.RLock()
+        self._edits = None  # (product_id, title, code) or (product_id,) made during a build
+        self._clear()
+
+    def _clear(self):
+        self._docs = {}                   # product_id -> (title, code, terms)
+        self._postings = defaultdict(set)  # term -> product ids
+        self._terms = []                   # sorted index terms
+        self._grams = defaultdict(set)     # trigram -> terms
+
+    def _terms_for(self, title, code):
+        return frozenset(token[:MAX_TERM_LENGTH] for token in tokenize(f"{title} {code}"))
+
+    def build(self, rows):
+        """Replace the index contents with ``(id, title, code)`` rows.
+
+        The new index is built without holding the lock, so ``suggest`` keeps
+        answering from the old one; edits made meanwhile are replayed on top.
+        """
+        with self._lock:
+            self._edits = []
+        fresh = AutocompleteIndex(self.max_products)
+        try:
+            for product_id, title, code in rows:
+                fresh._add(product_id, title, code)
+        except BaseException:
+            with self._lock:
+                self._edits = None
+            raise
+
+        with self._lock:
+            for edit in self._edits:
+                fresh._remove(edit[0])
+                if len(edit) > 1:
+                    fresh._add(*edit)
+            self._docs, self._postings, self._terms, self._grams = (
+                fresh._docs, fresh._postings, fresh._terms, fresh._grams)
+            self.dropped = fresh.dropped
+            self._edits = None
+            self.built_at = time.monotonic()
+        return self
+
+    def add(self, product_id, title, code):
+        with self._lock:
+            self._remove(product_id)
+            self._add(product_id, title, code)
+            if self._edits is not None:
+                self._edits.append((product_id, title, code))
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+            if self._edits is not None:
+                self._edits.append((product_id,))
+
+    def _add(self, product_id, title, code):
+        if len(self._docs) >= self.max_products:
+            self.dropped += 1
+            return
+        terms = self._terms_for(title, code)
+        self._docs[product_id] = (title, code, terms)
+        for term in terms:
+            if term not in self._postings:
+                insort(self._terms, term)
+                for gram in _grams(term):
+                    self._grams[gram].add(term)
+            self._postings[term].add(product_id)
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        for term in doc[2]:
+            postings = self._postings[term]
+            postings.discard(product_id)
+            if postings:
+                continue
+            # ✅ Last product using this term: drop it so edits don't leak memory
+            del self._postings[term]
+            del self._terms[bisect_left(self._terms, term)]
+            for gram in _grams(term):
+                self._grams[gram].discard(term)
+                if not self._grams[gram]:
+                    del self._grams[gram]
+
+    def _match_token(self, token):
+        """``{term: score}`` for index terms matching ``token`` as a (possibly misspelled) prefix."""
+        matches = {}
+        start = bisect_left(self._terms, token)
+        for term in self._terms[start:start + MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            matches[term] = 1.0
+        if len(matches) >= MAX_EXPANSIONS or len(token) < 3:
+            return matches
+
+        max_distance = 1 if len(token) <= 4 else 2
+        shared = Counter(term for gram in _grams(token) for term in self._grams.get(gram, ()))
+        # ✅ Typos leave most trigrams intact, so the best-overlapping terms are checked first
+        for term, _ in shared.most_common(MAX_FUZZY_CHECKS):
+            if term in matches:
+                continue
+            distance = prefix_distance(token, term, max_distance)
+            if distance <= max_distance:
+                matches[term] = 1.0 / (1 + distance)
+        return matches
+
+    def suggest(self, query, limit=8):
+        """Up to ``limit`` ``(product_id, title, code)`` matches for every token of ``query``."""
+        tokens = [token[:MAX_TERM_LENGTH] for token in tokenize(query)]
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores = None
+            for token in tokens:
+                token_scores = {}
+                for term, score in self._match_token(token).items():
+                    for product_id in self._postings[term]:
+                        if score > token_scores.get(product_id, 0):
+                            token_scores[product_id] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pid: scores[pid] + s for pid, s in token_scores.items() if pid in scores}
+                if not scores:
+                    return []
+
+            ranked = sorted(scores, key=lambda pid: (-scores[pid], len(self._docs[pid][0]), pid))[:limit]
+            return [(pid, *self._docs[pid][:2]) for pid in ranked]
+
+    def stats(self):
+        """Entry counts and an estimate of the index's memory footprint in bytes."""
+        with self._lock:
+            size = sum(sys.getsizeof(container) for container in (
+                self._docs, self._postings, self._terms, self._grams))
+            size += sum(sys.getsizeof(doc) + sys.getsizeof(doc[0]) + sys.getsizeof(doc[1])
+                        + sys.getsizeof(doc[2]) for doc in self._docs.values())
+            size += sum(sys.getsizeof(term) + sys.getsizeof(ids) + 28 * len(ids)
+                        for term, ids in self._postings.items())
+            size += sum(sys.getsizeof(gram) + sys.getsizeof(terms) for gram, terms in self._grams.items())
+            return {
+                "products": len(self._docs),
+                "terms": len(self._terms),
+                "trigrams": len(self._grams),
+                "dropped": self.dropped,
+                "bytes": size,
+            }
+
+
+autocomplete_index = AutocompleteIndex()
+_rebuild_lock = threading.Lock()
+
+
+def _is_stale(index):
+    return index.built_at is None or time.monotonic() - index.built_at > AUTOCOMPLETE_MAX_AGE
+
+
+def get_autocomplete_index():
+    """The process-wide index, (re)built from the database when missing or stale.
+
+    Product saves and deletes in this process update it in place (see
+    ``shop.signals``); the age limit picks up edits made by other workers.
+    Only the very first build happens in a request; a stale index keeps
+    serving while one background thread rebuilds it.
+    """
+    index = autocomplete_index
+    if not _is_stale(index):
+        return index
+    if index.built_at is None:
+        with _rebuild_lock:
+            if index.built_at is None:  # ✅ Another request may have built it while we waited
+                rebuild_autocomplete_index()
+    elif _rebuild_lock.acquire(blocking=False):
+        try:
+            threading.Thread(target=_rebuild_in_background, name="autocomplete-rebuild", daemon=True).start()
+        except BaseException:
+            _rebuild_lock.release()
+            raise
+    return index
+
+
+def _rebuild_in_background():
+    """Runs with ``_rebuild_lock`` held by the request that started it."""
+    close_old_connections()
+    try:
+        if _is_stale(autocomplete_index):
+            rebuild_autocomplete_index()
+    except Exception:
+        logger.exception("Autocomplete rebuild failed; the stale index stays in use")
+    finally:
+        close_old_connections()
+        _rebuild_lock.release()
+
+
+def rebuild_autocomplete_index():
+    return autocomplete_index.build(
+        Product.objects.order_by("id").values_list("id", "title", "code").iterator())
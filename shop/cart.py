@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Sum
+
+from .inventory import reserve
+from .models import Cart, CartItem
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+CENTS = Decimal("0.01")
+
+
+def recalculate_cart_totals(cart):
+    """Recompute ``cart.total`` and ``cart.discount`` from its items.
+
+    One aggregate SELECT and one UPDATE, whatever the number of items.
+    The passed ``cart`` instance is updated in place and returned.
+    """
+    totals = CartItem.objects.filter(cart_id=cart.pk).aggregate(
+        total=Sum(F("price") * F("qty"), output_field=MONEY),
+        discount=Sum("discount"),
+    )
+    cart.total = (totals["total"] or Decimal("0")).quantize(CENTS)
+    cart.discount = (totals["discount"] or Decimal("0")).quantize(CENTS)
+    Cart.objects.filter(pk=cart.pk).update(total=cart.total, discount=cart.discount)
+    return cart
+
+
+def _increment_line(cart, product, qty):
+    """Atomically bump an existing line; returns the number of rows updated (0 or 1)."""
+    return CartItem.objects.filter(cart=cart, product=product).update(
+        qty=F("qty") + qty,
+        line_total=F("line_total") + F("price") * qty,
+    )
+
+
+def add_product_to_cart(cart, product, qty=1):
+    """Add ``qty`` units of ``product`` to ``cart`` without losing concurrent increments.
+
+    The cart row is locked first so concurrent adds to the same cart
+    serialize and the recomputed totals always see every committed line.
+    The new line quantity is reserved against stock first (see
+    ``shop.inventory``), so a full cart can't oversell a flash sale.
+    Existing lines are bumped with a single ``UPDATE ... SET qty = qty + n``;
+    a new line is inserted under the (cart, product) unique constraint, and
+    if another request inserted it first we fall back to the increment.
+    """
+    with transaction.atomic():
+        Cart.objects.select_for_update().filter(pk=cart.pk).values_list("pk").get()
+
+        # ✅ Hold stock for the whole line before touching it (raises InsufficientStock)
+        current = CartItem.objects.filter(
+            cart=cart, product=product).values_list("qty", flat=True).first() or 0
+        reserve(cart, product, current + qty)
+
+        if not _increment_line(cart, product, qty):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(
+                        cart=cart, product=product, qty=qty, price=product.price, discount=0)
+            except IntegrityError:
+                _increment_line(cart, product, qty)
+        return recalculate_cart_totals(cart)
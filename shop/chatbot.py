@@ -0,0 +1,219 @@
+import abc
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .ai_cache import ResultCache
+
+CHATBOT_MODEL = getattr(settings, "CHATBOT_MODEL", "models/gemini-1.5-pro-latest")
+CHATBOT_TIMEOUT = getattr(settings, "CHATBOT_TIMEOUT", 30)
+
+chatbot_cache = ResultCache("chatbot", timeout=getattr(settings, "CHATBOT_CACHE_TIMEOUT", 600))
+
+# ✅ Thread-safe state so prompts can be coalesced across event loops (WSGI runs one per request)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class ChatbotTimeout(Exception):
+    """Raised when the upstream model doesn't answer within ``CHATBOT_TIMEOUT``."""
+
+
+class ChatbotBackend(abc.ABC):
+    """Interface for chatbot backends; ``stream`` yields the answer in chunks."""
+
+    @abc.abstractmethod
+    def stream(self, prompt):
+        """Async generator of answer chunks for ``prompt``."""
+
+
+class GeminiBackend(ChatbotBackend):
+    """Google Gemini, configured once per process and sharing one model object."""
+
+    def __init__(self, model_name=CHATBOT_MODEL):
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(model_name)
+
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async(
+            prompt, stream=True, request_options={"timeout": CHATBOT_TIMEOUT})
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeBackend(ChatbotBackend):
+    """Offline backend for tests and local development; echoes the prompt word by word."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+
+    async def stream(self, prompt):
+        for word in f"You said: {prompt}".split(" "):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word + " "
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide backend instance, chosen by ``settings.CHATBOT_BACKEND``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, "CHATBOT_BACKEND", "shop.chatbot.GeminiBackend")
+                _backend = import_string(backend_path)()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the backend (e.g. a ``FakeBackend`` in tests); ``None`` resets it."""
+    global _backend
+    _backend = backend
+
+
+def normalize_prompt(prompt):
+    """Canonical form used to match near-identical questions (case, punctuation, spacing)."""
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+
+async def _stream_upstream(prompt, timeout):
+    """Yield chunks from the backend, raising ``ChatbotTimeout`` once ``timeout`` seconds have passed."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    chunks = get_backend().stream(prompt).__aiter__()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise ChatbotTimeout(f"No answer from the chatbot within {timeout}s.")
+        try:
+            yield await asyncio.wait_for(chunks.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise ChatbotTimeout(f"No answer from the chatbot within {timeout}s.") from None
+
+
+class _SharedAnswer:
+    """One upstream answer in flight, fetched by a detached task and followed by every asker.
+
+    Chunks are kept as they arrive and ``result`` (a thread-safe future)
+    settles with the full text or the error. Followers may live on other
+    event loops, so they are woken with ``call_soon_threadsafe``.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.result = Future()
+        self.task = None  # ✅ Strong reference: the event loop only keeps weak ones
+        self._followers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, chunk):
+        with self._lock:
+            self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, text=None, error=None):
+        with self._lock:
+            if error is not None:
+                self.result.set_exception(error)
+            else:
+                self.result.set_result(text)
+        self._wake()
+
+    def _wake(self):
+        with self._lock:
+            followers = list(self._followers)
+        for loop, event in followers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # That follower's event loop has already closed
+
+    async def follow(self, timeout):
+        """Yield every chunk, past and future; raises the fetch's error or ``ChatbotTimeout``."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        follower = (loop, asyncio.Event())
+        with self._lock:
+            self._followers.add(follower)
+        try:
+            sent = 0
+            while True:
+                follower[1].clear()
+                with self._lock:
+                    new, finished = self.chunks[sent:], self.result.done()
+                for chunk in new:
+                    yield chunk
+                sent += len(new)
+                if finished:
+                    self.result.result()  # ✅ Re-raises the upstream error, if any
+                    return
+                try:
+                    await asyncio.wait_for(follower[1].wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    raise ChatbotTimeout(f"No answer from the chatbot within {timeout}s.") from None
+        finally:
+            with self._lock:
+                self._followers.discard(follower)
+
+
+async def _fetch(key, prompt, timeout, shared):
+    """Stream the upstream answer into ``shared``, cache it and leave the in-flight table."""
+    try:
+        async for chunk in _stream_upstream(prompt, timeout):
+            shared.publish(chunk)
+        text = "".join(shared.chunks)
+        await sync_to_async(chatbot_cache.set)(CHATBOT_MODEL, key, text)
+        shared.finish(text)
+    except Exception as e:
+        shared.finish(error=e)
+    except BaseException:
+        # ✅ Only reached if the event loop itself shuts down (e.g. the per-request loop under WSGI)
+        shared.finish(error=ChatbotTimeout("Answer was abandoned."))
+        raise
+    finally:
+        with _inflight_lock:
+            if _inflight.get(key) is shared:
+                del _inflight[key]
+
+
+async def stream_answer(prompt, timeout=CHATBOT_TIMEOUT):
+    """Yield answer chunks, served from the cache or shared with an identical in-flight prompt.
+
+    The first caller for a normalized prompt starts a detached task that
+    streams from the backend; that caller and anyone asking the same question
+    meanwhile follow the task, so a client that disconnects (the first one
+    included) never cancels the upstream call for the others.
+    """
+    key = normalize_prompt(prompt)
+    cached = await sync_to_async(chatbot_cache.get)(CHATBOT_MODEL, key)
+    if cached is not None:
+        yield cached
+        return
+
+    with _inflight_lock:
+        shared = _inflight.get(key)
+        if shared is None:
+            shared = _inflight[key] = _SharedAnswer()
+            shared.task = asyncio.get_running_loop().create_task(_fetch(key, prompt, timeout, shared))
+
+    async for chunk in shared.follow(timeout):
+        yield chunk
+
+
+async def answer(prompt, timeout=CHATBOT_TIMEOUT):
+    """Full answer text, subject to the same cache and timeout as ``stream_answer``."""
+    return "".join([chunk async for chunk in stream_answer(prompt, timeout)])
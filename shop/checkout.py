@@ -0,0 +1,126 @@
+import hashlib
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from .facets import apply_facet_deltas, facet_key
+from .inventory import release, reserved_by_others
+from .models import Cart, CartItem, Product, PurchaseDetail, PurchaseHeader
+
+
+class CheckoutError(Exception):
+    """Base class for reasons a cart can't be checked out."""
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+class OutOfStock(CheckoutError):
+    """Raised when a cart asks for more units than are in stock; nothing is written."""
+
+    def __init__(self, products):
+        self.products = products
+        names = ", ".join(product.title for product in products)
+        super().__init__(f"Not enough stock for: {names}")
+
+
+def checkout_cart(customer, idempotency_key=None):
+    """Turn the customer's cart into a purchase in one transaction.
+
+    Product rows are locked in primary-key order (so concurrent checkouts
+    can't deadlock), stock held by other carts' reservations is excluded,
+    stock is decremented with a single conditional UPDATE,
+    purchase lines are written with ``bulk_create`` and the cart is cleared
+    with one DELETE — a fixed number of queries whatever the cart size.
+
+    With an ``idempotency_key``, a retry of a checkout that already went
+    through returns the original purchase instead of placing a new order.
+    Keys of any length are accepted; their SHA-256 digest is what's stored.
+    """
+    idempotency_key = _key_digest(idempotency_key)
+    if idempotency_key:
+        previous = _previous_purchase(customer, idempotency_key)
+        if previous is not None:
+            return previous
+
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(customer=customer)
+
+        # ✅ A concurrent retry may have committed while we waited for the cart lock
+        if idempotency_key:
+            previous = _previous_purchase(customer, idempotency_key)
+            if previous is not None:
+                return previous
+
+        items = list(cart.items.select_related("product").order_by("product_id"))
+        if not items:
+            raise EmptyCart("Your cart is empty!")
+
+        product_ids = [item.product_id for item in items]
+        stock = dict(
+            Product.objects.select_for_update().filter(
+                pk__in=product_ids).order_by("pk").values_list("pk", "qty")
+        )
+        # ✅ Units held by other carts aren't for sale; our own holds are
+        held = reserved_by_others(product_ids, cart)
+        short = [
+            item.product for item in items
+            if stock.get(item.product_id, 0) - held.get(item.product_id, 0) < item.qty
+        ]
+        if short:
+            raise OutOfStock(short)
+
+        # ✅ The qty >= n guard makes the UPDATE itself refuse to oversell
+        updated = Product.objects.filter(
+            reduce(or_, (Q(pk=item.product_id, qty__gte=item.qty) for item in items))
+        ).update(qty=Case(
+            *(When(pk=item.product_id, then=F("qty") - item.qty) for item in items),
+            default=F("qty"),
+            output_field=PositiveIntegerField(),
+        ))
+        if updated != len(items):
+            raise OutOfStock([item.product for item in items])
+
+        # ✅ The bulk UPDATE bypasses Product signals, so move sold-out products' facet counts here
+        sold_out = Counter()
+        for item in items:
+            if stock[item.product_id] == item.qty:
+                sold_out[facet_key(item.product.price, 1)] -= 1
+                sold_out[facet_key(item.product.price, 0)] += 1
+        apply_facet_deltas(sold_out)
+
+        purchase = PurchaseHeader.objects.create(
+            customer=customer, total=cart.total, discount=cart.discount,
+            idempotency_key=idempotency_key)
+        PurchaseDetail.objects.bulk_create([
+            PurchaseDetail(
+                purchaseHeader=purchase,
+                product=item.product,
+                description=item.product.description,
+                qty=item.qty,
+                price=item.price,
+                discount=item.discount,
+                line_total=item.line_total,
+            )
+            for item in items
+        ])
+
+        CartItem.objects.filter(cart=cart).delete()
+        release(cart)
+        Cart.objects.filter(pk=cart.pk).update(total=0, discount=0)
+    return purchase
+
+
+def _key_digest(idempotency_key):
+    """Fixed-length (64 hex characters) form of a client key, so it always fits the column."""
+    if not idempotency_key:
+        return None
+    return hashlib.sha256(idempotency_key.encode()).hexdigest()
+
+
+def _previous_purchase(customer, idempotency_key):
+    return PurchaseHeader.objects.filter(customer=customer, idempotency_key=idempotency_key).first()
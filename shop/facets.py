@@ -0,0 +1,137 @@
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from .models import Product, ProductFacetBucket
+
+# ✅ Upper bounds of the price ranges; the last bucket is open-ended. Run rebuild_facets after changing.
+PRICE_FACET_BOUNDS = [Decimal(str(bound)) for bound in getattr(
+    settings, "PRICE_FACET_BOUNDS", [10, 25, 50, 100, 250])]
+
+
+def price_bucket(price):
+    return bisect_right(PRICE_FACET_BOUNDS, price)
+
+
+def price_range(bucket):
+    """``(low, high)`` bounds of a bucket; ``high`` is ``None`` for the last one."""
+    low = PRICE_FACET_BOUNDS[bucket - 1] if bucket > 0 else Decimal("0")
+    high = PRICE_FACET_BOUNDS[bucket] if bucket < len(PRICE_FACET_BOUNDS) else None
+    return low, high
+
+
+def price_label(bucket):
+    low, high = price_range(bucket)
+    if high is None:
+        return f"${low:g}+"
+    return f"Under ${high:g}" if bucket == 0 else f"${low:g}–${high:g}"
+
+
+def facet_key(price, qty):
+    return price_bucket(price), qty > 0
+
+
+def apply_facet_deltas(deltas):
+    """Add ``{facet_key: delta}`` to the stored counts, one UPDATE per changed bucket."""
+    for (bucket, in_stock), delta in deltas.items():
+        if not delta:
+            continue
+        updated = ProductFacetBucket.objects.filter(
+            price_bucket=bucket, in_stock=in_stock).update(count=F("count") + delta)
+        # ✅ A missing cell is only created to add products; a removal from it is left to rebuild_facets
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    ProductFacetBucket.objects.create(price_bucket=bucket, in_stock=in_stock, count=delta)
+            except IntegrityError:
+                ProductFacetBucket.objects.filter(
+                    price_bucket=bucket, in_stock=in_stock).update(count=F("count") + delta)
+
+
+def move_product(old_key, new_key):
+    """Record a product moving between facet cells (``None`` for created/deleted)."""
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_facet_deltas(deltas)
+
+
+def rebuild_facet_counts():
+    """Recount every facet cell from the product table; returns the number of products counted."""
+    counts = Counter(facet_key(price, qty) for price, qty in Product.objects.values_list("price", "qty").iterator())
+    with transaction.atomic():
+        ProductFacetBucket.objects.all().delete()
+        ProductFacetBucket.objects.bulk_create([
+            ProductFacetBucket(price_bucket=bucket, in_stock=in_stock, count=count)
+            for (bucket, in_stock), count in counts.items()
+        ])
+    return sum(counts.values())
+
+
+def filter_products(queryset, bucket=None, in_stock=False):
+    if bucket is not None:
+        low, high = price_range(bucket)
+        queryset = queryset.filter(price__gte=low)
+        if high is not None:
+            queryset = queryset.filter(price__lt=high)
+    if in_stock:
+        queryset = queryset.filter(qty__gt=0)
+    return queryset
+
+
+def parse_price_bucket(value):
+    try:
+        bucket = int(value)
+    except (TypeError, ValueError):
+        return None
+    return bucket if 0 <= bucket <= len(PRICE_FACET_BOUNDS) else None
+
+
+def count_cells(queryset):
+    """``(price_bucket, in_stock, count)`` cells of ``queryset``, grouped by one aggregate query."""
+    bucket = Case(
+        *[When(price__lt=bound, then=Value(b)) for b, bound in enumerate(PRICE_FACET_BOUNDS)],
+        default=Value(len(PRICE_FACET_BOUNDS)), output_field=IntegerField())
+    stocked = Case(When(Q(qty__gt=0), then=Value(1)), default=Value(0), output_field=IntegerField())
+    return [
+        (cell_bucket, bool(cell_in_stock), count)
+        for cell_bucket, cell_in_stock, count in queryset.order_by().annotate(
+            cell_bucket=bucket, cell_in_stock=stocked,
+        ).values_list("cell_bucket", "cell_in_stock").annotate(count=Count("pk"))
+    ]
+
+
+def facet_counts(bucket=None, in_stock=False, queryset=None):
+    """Counts for the price and stock facets, each narrowed by the other's selection.
+
+    Reads the precomputed cells in one query; when ``queryset`` (e.g. the
+    search matches) is given, its products are counted by one aggregate instead.
+    """
+    if queryset is None:
+        cells = ProductFacetBucket.objects.values_list("price_bucket", "in_stock", "count")
+    else:
+        cells = count_cells(queryset)
+
+    price_counts = Counter()
+    in_stock_count = 0
+    for cell_bucket, cell_in_stock, count in cells:
+        if cell_in_stock or not in_stock:
+            price_counts[cell_bucket] += count
+        if cell_in_stock and (bucket is None or cell_bucket == bucket):
+            in_stock_count += count
+
+    return {
+        "price": [
+            {"bucket": b, "label": price_label(b), "count": price_counts[b], "selected": b == bucket}
+            for b in range(len(PRICE_FACET_BOUNDS) + 1)
+        ],
+        "in_stock": in_stock_count,
+    }
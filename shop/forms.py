@@ -1,5 +1,6 @@
 from django import forms
 from .models import Customer, Product, CartItem, Feedback
+from .inventory import available_to_sell
 from django.contrib.auth.models import User
 
 class UserRegistrationForm(forms.ModelForm):
@@ -74,8 +75,11 @@ class CartItemForm(forms.ModelForm):
 
         if qty < 1:
             raise forms.ValidationError("Quantity must be at least 1.")
-        if product.qty < qty:
-            raise forms.ValidationError(f"Only {product.qty} units left in stock.")
+
+        # ✅ Units held by other shoppers' carts aren't available
+        available = available_to_sell(product, exclude_cart=self.instance.cart)
+        if available < qty:
+            raise forms.ValidationError(f"Only {max(available, 0)} units left in stock.")
 
         return qty
 
@@ -89,8 +93,7 @@ class CartItemForm(forms.ModelForm):
 class FeedbackForm(forms.ModelForm):
     class Meta:
         model = Feedback
-        fields = ["comments", "sentiment"]
+        fields = ["comments"]  # ✅ sentiment is set by the background scorer, never by the customer
         widgets = {
             'comments': forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Write your feedback...'}),
-            "sentiment": forms.Select(),
         }
\ No newline at end of file
@@ -0,0 +1,107 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from .ai_cache import description_cache
+from .ai_models import DESCRIPTION_MODEL, get_description_generator
+
+# ✅ max_new_tokens, not max_length: the latter counts the prompt and left padding, so a prompt's
+# output would depend on what it was batched with. These params are part of the cache key.
+DESCRIPTION_PARAMS = {
+    "max_new_tokens": getattr(settings, "DESCRIPTION_MAX_NEW_TOKENS", 40),
+    "num_return_sequences": 1,
+}
+
+
+class MicroBatcher:
+    """Collects concurrent requests for a few milliseconds and runs them as one batch.
+
+    ``batch_fn`` receives a list of inputs and must return a list of results
+    in the same order. Callers block in ``submit`` until their result is ready.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait=0.01):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, item, timeout=None):
+        """Queue ``item`` for the next batch and wait for its result."""
+        return self.submit_async(item).result(timeout=timeout)
+
+    def submit_async(self, item):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or the wait expires."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _generate_descriptions(prompts):
+    """Run a batch of prompts through the shared GPT-2 pipeline with padding."""
+    generator = get_description_generator()
+
+    # ✅ GPT-2 has no pad token; pad on the left with EOS so generation continues the prompt
+    if generator.tokenizer.pad_token_id is None:
+        generator.tokenizer.pad_token_id = generator.model.config.eos_token_id
+    generator.tokenizer.padding_side = "left"
+
+    outputs = generator(prompts, batch_size=len(prompts), **DESCRIPTION_PARAMS)
+    return [output[0]["generated_text"] for output in outputs]
+
+
+description_batcher = MicroBatcher(
+    _generate_descriptions,
+    max_batch_size=getattr(settings, "DESCRIPTION_BATCH_SIZE", 8),
+    max_wait=getattr(settings, "DESCRIPTION_BATCH_WAIT_MS", 10) / 1000,
+)
+
+
+def generate_description_text(prompt):
+    """Generate a description, served from the cache or batched with concurrent requests."""
+    return description_cache.get_or_compute(
+        DESCRIPTION_MODEL, prompt,
+        lambda: description_batcher.submit(prompt),
+        params=DESCRIPTION_PARAMS,
+    )
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+RESERVATION_TTL = timedelta(minutes=getattr(settings, "CART_RESERVATION_MINUTES", 15))
+
+
+class InsufficientStock(Exception):
+    """Raised when a hold would take more than the stock not already held by other carts."""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = max(available, 0)
+        super().__init__(f"Only {self.available} units of {product.title} left in stock.")
+
+
+def active_reservations(now=None):
+    return StockReservation.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def reserved_by_others(product_ids, cart, now=None):
+    """``{product_id: units}`` held by unexpired reservations of carts other than ``cart``."""
+    return dict(
+        active_reservations(now).filter(product_id__in=product_ids).exclude(cart=cart)
+        .values("product_id").annotate(units=Sum("qty")).values_list("product_id", "units")
+    )
+
+
+def available_to_sell(product, exclude_cart=None):
+    """Stock minus unexpired holds (optionally ignoring the holds of ``exclude_cart``)."""
+    held = active_reservations().filter(product=product)
+    if exclude_cart is not None:
+        held = held.exclude(cart=exclude_cart)
+    return product.qty - (held.aggregate(units=Sum("qty"))["units"] or 0)
+
+
+def reserve(cart, product, qty):
+    """Hold ``qty`` units of ``product`` for ``cart``, replacing its previous hold.
+
+    The product row is locked so concurrent carts can't both take the last
+    units; raises ``InsufficientStock`` if the hold doesn't fit.
+    """
+    with transaction.atomic():
+        stock = Product.objects.select_for_update().values_list("qty", flat=True).get(pk=product.pk)
+        available = stock - reserved_by_others([product.pk], cart).get(product.pk, 0)
+        if qty > available:
+            raise InsufficientStock(product, available)
+        expires_at = timezone.now() + RESERVATION_TTL
+        if not StockReservation.objects.filter(cart=cart, product=product).update(
+                qty=qty, expires_at=expires_at):
+            StockReservation.objects.create(cart=cart, product=product, qty=qty, expires_at=expires_at)
+
+
+def release(cart, product=None):
+    """Drop the cart's hold on ``product`` (or all its holds)."""
+    holds = StockReservation.objects.filter(cart=cart)
+    if product is not None:
+        holds = holds.filter(product=product)
+    holds.delete()
+
+
+def expire_reservations(batch_size=1000, now=None):
+    """Delete expired holds in batches of ``batch_size``; returns the number removed."""
+    now = now or timezone.now()
+    removed = 0
+    while True:
+        ids = list(StockReservation.objects.filter(
+            expires_at__lte=now).values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return removed
+        removed += StockReservation.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,194 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .inference import generate_description_text
+from .models import DescriptionJob, Feedback
+from .reviews import refresh_review_stats
+from .utils import score_feedbacks
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when too many description jobs are already waiting."""
+
+
+class DescriptionJobQueue:
+    """DB-backed job queue for description generation with a local thread pool.
+
+    Jobs are stored as ``DescriptionJob`` rows so their status survives the
+    request that created them; the pool only carries job ids. Jobs left behind
+    by a restarted process are picked up by ``recover`` on first use.
+    """
+
+    def __init__(self, generate, max_workers=2, max_depth=50,
+                 stale_after=timedelta(minutes=10), keep_finished=timedelta(days=1)):
+        self.generate = generate
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.stale_after = stale_after
+        self.keep_finished = keep_finished
+        self._pool = None
+        self._recovered = False
+        self._lock = threading.Lock()
+
+    def depth(self):
+        """Number of jobs waiting or in progress across all processes."""
+        return DescriptionJob.objects.filter(
+            status__in=[DescriptionJob.PENDING, DescriptionJob.RUNNING]).count()
+
+    def enqueue(self, prompt):
+        """Store a new job and hand it to the pool once the row is committed."""
+        with self._lock:
+            recover, self._recovered = not self._recovered, True
+        if recover:
+            self.recover()
+        if self.depth() >= self.max_depth:
+            # ✅ A worker that died mid-job must not keep the queue full forever
+            if not self.fail_stale() or self.depth() >= self.max_depth:
+                raise QueueFull(f"Description queue is full ({self.max_depth} jobs pending).")
+
+        job = DescriptionJob.objects.create(prompt=prompt)
+        transaction.on_commit(lambda: self._executor().submit(self._run_in_thread, job.id))
+        return job
+
+    def recover(self):
+        """Resubmit pending jobs, fail stale running ones and prune old finished ones.
+
+        Returns ``(resubmitted, failed, pruned)`` counts.
+        """
+        failed = self.fail_stale()
+        pruned, _ = DescriptionJob.objects.filter(
+            status__in=[DescriptionJob.DONE, DescriptionJob.FAILED],
+            finished_at__lt=timezone.now() - self.keep_finished).delete()
+        pending = list(DescriptionJob.objects.filter(
+            status=DescriptionJob.PENDING).order_by("created_at").values_list("id", flat=True))
+        for job_id in pending:
+            # ✅ run() claims jobs conditionally, so one queued by another process is still run once
+            self._executor().submit(self._run_in_thread, job_id)
+        if failed or pruned or pending:
+            logger.info("Description jobs recovered: %d resubmitted, %d failed, %d pruned",
+                        len(pending), failed, pruned)
+        return len(pending), failed, pruned
+
+    def fail_stale(self):
+        """Mark jobs running for longer than ``stale_after`` as failed; returns how many."""
+        return DescriptionJob.objects.filter(
+            status=DescriptionJob.RUNNING, started_at__lt=timezone.now() - self.stale_after,
+        ).update(status=DescriptionJob.FAILED, error="Worker stopped before the job finished.",
+                 finished_at=timezone.now())
+
+    def run(self, job_id):
+        """Claim a pending job and generate its description."""
+        # ✅ Conditional update so a job is never processed twice
+        claimed = DescriptionJob.objects.filter(
+            id=job_id, status=DescriptionJob.PENDING).update(
+            status=DescriptionJob.RUNNING, started_at=timezone.now())
+        if not claimed:
+            return
+
+        # ✅ Only finish a job that is still ours; fail_stale may have given up on it meanwhile
+        running = DescriptionJob.objects.filter(id=job_id, status=DescriptionJob.RUNNING)
+        try:
+            result = self.generate(DescriptionJob.objects.values_list("prompt", flat=True).get(id=job_id))
+        except Exception as e:
+            running.update(status=DescriptionJob.FAILED, error=str(e), finished_at=timezone.now())
+        else:
+            running.update(status=DescriptionJob.DONE, result=result, finished_at=timezone.now())
+
+    def _run_in_thread(self, job_id):
+        close_old_connections()
+        try:
+            self.run(job_id)
+        finally:
+            close_old_connections()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="description-job")
+            return self._pool
+
+
+description_jobs = DescriptionJobQueue(
+    generate_description_text,
+    max_workers=getattr(settings, "DESCRIPTION_JOB_WORKERS", 2),
+    max_depth=getattr(settings, "DESCRIPTION_JOB_MAX_DEPTH", 50),
+    stale_after=timedelta(minutes=getattr(settings, "DESCRIPTION_JOB_STALE_MINUTES", 10)),
+    keep_finished=timedelta(days=getattr(settings, "DESCRIPTION_JOB_KEEP_DAYS", 1)),
+)
+
+
+class FeedbackScoringQueue:
+    """Scores pending feedback (``sentiment IS NULL``) in batches on a local worker thread.
+
+    The feedback rows themselves are the queue: ``enqueue`` only schedules a
+    drain after the write commits, and concurrent submissions share one drain.
+    """
+
+    def __init__(self, score=score_feedbacks, batch_size=100):
+        self.score = score
+        self.batch_size = batch_size
+        self._pool = None
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def enqueue(self):
+        """Make sure a drain runs once the current transaction commits."""
+        transaction.on_commit(self._schedule)
+
+    def _schedule(self):
+        with self._lock:
+            if self._scheduled:
+                return  # ✅ A drain that hasn't started yet will pick this row up too
+            self._scheduled = True
+            if self._pool is None:
+                # ✅ One worker: batches are written in order and never race each other
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedback-scoring")
+        self._pool.submit(self._drain_in_thread)
+
+    def drain(self):
+        """Score pending feedback until none is left; returns the number of rows scored."""
+        scored = 0
+        while True:
+            batch = list(Feedback.objects.filter(sentiment__isnull=True).only(
+                "id", "product_id", "comments").order_by("pk")[:self.batch_size])
+            if not batch:
+                return scored
+            self.score(batch)
+            Feedback.objects.bulk_update(batch, ["sentiment_score", "sentiment"])
+            refresh_review_stats({feedback.product_id for feedback in batch})
+            scored += len(batch)
+
+    def lag(self):
+        """``(pending rows, seconds since the oldest pending row was written)``."""
+        pending = Feedback.objects.filter(sentiment__isnull=True).aggregate(
+            rows=Count("id"), oldest=Min("created_at"))
+        lag = (timezone.now() - pending["oldest"]).total_seconds() if pending["oldest"] else 0.0
+        return pending["rows"], lag
+
+    def _drain_in_thread(self):
+        with self._lock:
+            self._scheduled = False
+        close_old_connections()
+        try:
+            _, lag = self.lag()
+            scored = self.drain()
+            logger.info("Scored %d feedback rows; oldest had waited %.1fs", scored, lag)
+        except Exception:
+            logger.exception("Feedback scoring failed; rows stay pending for the next drain")
+        finally:
+            close_old_connections()
+
+
+feedback_scoring = FeedbackScoringQueue(
+    batch_size=getattr(settings, "FEEDBACK_SCORING_BATCH_SIZE", 100),
+)
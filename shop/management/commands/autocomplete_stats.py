@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.autocomplete import rebuild_autocomplete_index
+
+
+class Command(BaseCommand):
+    help = "Build the in-memory autocomplete index and report its size and lookup latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="*", help="Sample queries to time (default: a few typos).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = rebuild_autocomplete_index()
+        build_seconds = time.perf_counter() - started
+
+        stats = index.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {stats['products']} products, {stats['terms']} terms, "
+            f"{stats['trigrams']} trigrams in {build_seconds:.2f}s, "
+            f"~{stats['bytes'] / (1024 * 1024):.1f} MiB"
+        ))
+        if stats["dropped"]:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {stats['dropped']} products skipped (AUTOCOMPLETE_MAX_PRODUCTS={index.max_products})"))
+
+        for query in options["queries"] or ["spekaer", "blutooth", "mat"]:
+            started = time.perf_counter()
+            results = index.suggest(query)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"{query!r}: {len(results)} results in {elapsed_ms:.3f} ms")
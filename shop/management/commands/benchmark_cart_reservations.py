@@ -0,0 +1,71 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from shop.cart import add_product_to_cart
+from shop.inventory import InsufficientStock, active_reservations, available_to_sell
+from shop.models import Cart, Customer, Product
+
+
+class Command(BaseCommand):
+    help = "Race many carts for the last units of one product: adds/second and an oversell check."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--carts", type=int, default=200, help="Carts adding one unit each.")
+        parser.add_argument("--stock", type=int, default=50, help="Units of the flash-sale product.")
+        parser.add_argument("--workers", type=int, default=16, help="Concurrent threads.")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated product, users and carts.")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        product = Product.objects.create(
+            code=f"BENCH-{run}", title=f"Flash sale {run}", description="", price=1, qty=options["stock"])
+        carts = [
+            Cart.objects.create(customer=Customer.objects.create(
+                user=User.objects.create(username=f"bench-{run}-{i}")))
+            for i in range(options["carts"])
+        ]
+
+        def add(cart):
+            try:
+                add_product_to_cart(cart, product)
+                return "added"
+            except InsufficientStock:
+                return "refused"
+            except Exception as e:
+                return f"error: {type(e).__name__}"
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                outcomes = list(pool.map(add, carts))
+            elapsed = time.perf_counter() - started
+
+            added = outcomes.count("added")
+            held = active_reservations().filter(product=product).aggregate(units=Sum("qty"))["units"] or 0
+            errors = len(outcomes) - added - outcomes.count("refused")
+            self.stdout.write(
+                f"{len(carts)} carts, {options['workers']} workers: {len(carts) / elapsed:.0f} adds/s "
+                f"({added} added, {outcomes.count('refused')} refused, {errors} errors)")
+
+            if held > options["stock"] or added > options["stock"]:
+                self.stdout.write(self.style.ERROR(
+                    f"❌ Oversold: {added} adds and {held} units held for {options['stock']} in stock"))
+            elif errors:
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {errors} adds failed ({sorted(set(o for o in outcomes if o.startswith('error')))})"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ No oversell: {held} of {options['stock']} units held, "
+                    f"{available_to_sell(product)} left to sell"))
+        finally:
+            if not options["keep"]:
+                User.objects.filter(username__startswith=f"bench-{run}-").delete()
+                product.delete()
@@ -0,0 +1,44 @@
+import csv
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from shop.utils import SENTIMENT_BACKENDS, label_texts
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "fixtures" / "sentiment_reviews.csv"
+
+
+class Command(BaseCommand):
+    help = "Compare sentiment backends on a labelled review corpus: reviews/second and label accuracy."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "backends", nargs="*",
+            help=f"Backends to compare (default: all of {', '.join(SENTIMENT_BACKENDS)}).",
+        )
+        parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="CSV file with label,text columns.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the corpus per backend.")
+
+    def handle(self, *args, **options):
+        with open(options["corpus"], newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        texts = [row["text"] for row in rows]
+        expected = [row["label"] for row in rows]
+
+        self.stdout.write(f"{len(texts)} reviews from {options['corpus']}")
+        self.stdout.write(f"{'backend':<12} {'reviews/s':>10} {'accuracy':>9}")
+        for backend in options["backends"] or list(SENTIMENT_BACKENDS):
+            try:
+                labels = [label for _, label in label_texts(texts, backend)]  # ✅ Untimed: loads the model
+            except (ImportError, OSError) as e:
+                self.stdout.write(self.style.WARNING(f"{backend:<12} unavailable: {e}"))
+                continue
+
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                label_texts(texts, backend)
+            rate = len(texts) * options["repeat"] / (time.perf_counter() - started)
+
+            accuracy = sum(label == want for label, want in zip(labels, expected)) / len(texts)
+            self.stdout.write(f"{backend:<12} {rate:>10.0f} {accuracy:>9.1%}")
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import (
+    CUSTOMER_RECOMMENDATIONS, RECOMMENDATION_NEIGHBORS, rebuild_customer_recommendations, rebuild_neighbors,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item–item neighbour table and every customer's stored recommendations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-k", "--neighbors", type=int, default=RECOMMENDATION_NEIGHBORS,
+            help="Neighbours to keep per product.",
+        )
+        parser.add_argument(
+            "--per-customer", type=int, default=CUSTOMER_RECOMMENDATIONS,
+            help="Recommendations to store per customer.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        neighbor_rows = rebuild_neighbors(k=options["neighbors"])
+        customer_rows = rebuild_customer_recommendations(limit=options["per_customer"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Stored {neighbor_rows} neighbour rows and {customer_rows} customer recommendations "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
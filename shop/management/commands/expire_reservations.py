@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shop.inventory import expire_reservations
+
+
+class Command(BaseCommand):
+    help = "Delete expired cart stock reservations in batches (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = expire_reservations(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Removed {removed} expired reservations"))
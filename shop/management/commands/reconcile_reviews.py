@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.reviews import refresh_review_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every product's review summary from the Feedback table (run periodically)."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        products = refresh_review_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Reconciled review stats for {products} products in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.jobs import feedback_scoring
+from shop.models import Feedback
+from shop.reviews import refresh_review_stats
+from shop.utils import score_feedbacks
+
+
+class Command(BaseCommand):
+    help = "Backfill or re-score Feedback sentiment in chunks using bulk_update."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--only-unscored", action="store_true",
+            help="Skip feedback that already has a sentiment label.",
+        )
+        parser.add_argument(
+            "--status", action="store_true",
+            help="Only report how many rows await the background scorer and how long the oldest has waited.",
+        )
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            pending, lag = feedback_scoring.lag()
+            self.stdout.write(f"{pending} feedback rows pending, scoring lag {lag:.1f}s")
+            return
+
+        batch_size = options["batch_size"]
+        queryset = Feedback.objects.only("id", "product_id", "comments").order_by("pk")
+        if options["only_unscored"]:
+            queryset = queryset.filter(sentiment__isnull=True)
+
+        started = time.perf_counter()
+        scored = 0
+        last_pk = 0
+        while True:
+            # ✅ Keyset chunks: each batch is an indexed range scan, not an OFFSET
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            score_feedbacks(batch)
+            Feedback.objects.bulk_update(batch, ["sentiment_score", "sentiment"])
+            # ✅ bulk_update skips signals, so recount the touched products' review summaries
+            refresh_review_stats({feedback.product_id for feedback in batch})
+
+            scored += len(batch)
+            last_pk = batch[-1].pk
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Scored {scored} rows ({scored / elapsed:.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+        rate = scored / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Scored {scored} feedback rows in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
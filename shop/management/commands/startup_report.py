@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_SCRIPT = "import django; django.setup(); import {module}"
+
+
+class Command(BaseCommand):
+    help = "Report per-module import cost of starting the project (python -X importtime)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module", default="ecommerce.urls",
+            help="Module to import after django.setup() (default: the URLconf, which imports every view).",
+        )
+        parser.add_argument("--top", type=int, default=20, help="Number of modules to list.")
+
+    def handle(self, *args, **options):
+        # ✅ Fresh interpreter so modules already imported by manage.py don't hide their cost
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT.format(module=options["module"])],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if not self_us.strip().isdigit():
+                continue  # header row
+            # ✅ Nested imports are indented two spaces per level below their importer
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            timings.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+
+        # ✅ Top-level imports (cumulative includes everything they pulled in) plus our own modules
+        rows = [
+            row for row in timings
+            if row[1] == 0 or row[0].split(".")[0] in ("shop", "ecommerce")
+        ]
+        rows.sort(key=lambda row: row[3], reverse=True)
+
+        total_ms = sum(cumulative for _, depth, _, cumulative in timings if depth == 0) / 1000
+        self.stdout.write(f"{'module':<40} {'self ms':>10} {'cumulative ms':>15}")
+        for name, _, self_us, cumulative_us in rows[:options["top"]]:
+            self.stdout.write(f"{name:<40} {self_us / 1000:>10.1f} {cumulative_us / 1000:>15.1f}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Total import time: {total_ms:.1f} ms"))
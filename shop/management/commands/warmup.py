@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.ai_models import registry
+
+
+class Command(BaseCommand):
+    help = "Fetch and pre-load AI resources (transformer pipelines, NLTK lexicons, AI clients)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "models", nargs="*",
+            help="Registered model names to load (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            stats = registry.warm(options["models"] or None)
+        except KeyError as e:
+            raise CommandError(e.args[0])
+
+        for name, info in stats.items():
+            if not info["loaded"]:
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {name}: loaded in {info['load_seconds']:.2f}s, "
+                f"{info['memory_bytes'] / (1024 * 1024):.1f} MiB"
+            ))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0018_productneighbor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='shop.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_to', to='shop.product')),
+            ],
+            options={
+                'ordering': ['customer', 'rank'],
+                'indexes': [models.Index(fields=['customer', 'rank'], name='shop_custom_custome_635f19_idx')],
+                'unique_together': {('customer', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:46
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """Fold duplicate (cart, product) lines into one before the constraint is added."""
+    CartItem = apps.get_model('shop', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(lines=Count('id')).filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        items = list(CartItem.objects.filter(
+            cart_id=duplicate['cart_id'], product_id=duplicate['product_id']).order_by('id'))
+        keep = items[0]
+        keep.qty = sum(item.qty for item in items)
+        keep.discount = sum(item.discount for item in items)
+        keep.line_total = keep.price * keep.qty - keep.discount
+        keep.save(update_fields=['qty', 'discount', 'line_total'])
+        CartItem.objects.filter(id__in=[item.id for item in items[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_customerrecommendation'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='cartitem',
+            unique_together={('cart', 'product')},
+        ),
+    ]
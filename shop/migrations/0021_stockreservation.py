@@ -0,0 +1,28 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0020_cartitem_unique_cart_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shop.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='shop.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='shop_stockr_product_ad0dcd_idx'), models.Index(fields=['expires_at'], name='shop_stockr_expires_ab6cc8_idx')],
+                'unique_together': {('cart', 'product')},
+            },
+        ),
+    ]
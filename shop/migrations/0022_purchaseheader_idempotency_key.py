@@ -0,0 +1,22 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseheader',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='purchaseheader',
+            unique_together={('customer', 'idempotency_key')},
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_products(apps, schema_editor):
+    """Fill the postings for the catalogue that predates the index."""
+    from shop.search import product_terms
+
+    Product = apps.get_model('shop', 'Product')
+    ProductSearchTerm = apps.get_model('shop', 'ProductSearchTerm')
+    postings = []
+    for product in Product.objects.only('id', 'title', 'code', 'description').iterator(chunk_size=1000):
+        counts = product_terms(product)
+        doc_length = sum(counts.values())
+        postings.extend(
+            ProductSearchTerm(term=term, product_id=product.pk, tf=tf, doc_length=doc_length)
+            for term, tf in counts.items()
+        )
+        if len(postings) >= 1000:
+            ProductSearchTerm.objects.bulk_create(postings)
+            postings = []
+    ProductSearchTerm.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0022_purchaseheader_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('tf', models.PositiveIntegerField()),
+                ('doc_length', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='shop.product')),
+            ],
+            options={
+                'unique_together': {('term', 'product')},
+            },
+        ),
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:58
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def count_existing_products(apps, schema_editor):
+    """Start the facet cells from the current catalogue instead of from zero."""
+    from shop.facets import facet_key
+
+    Product = apps.get_model('shop', 'Product')
+    ProductFacetBucket = apps.get_model('shop', 'ProductFacetBucket')
+    counts = Counter(facet_key(price, qty) for price, qty in Product.objects.values_list('price', 'qty').iterator())
+    ProductFacetBucket.objects.bulk_create([
+        ProductFacetBucket(price_bucket=bucket, in_stock=in_stock, count=count)
+        for (bucket, in_stock), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0023_productsearchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('in_stock', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('price_bucket', 'in_stock')},
+            },
+        ),
+        migrations.RunPython(count_existing_products, migrations.RunPython.noop),
+    ]
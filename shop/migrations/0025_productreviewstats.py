@@ -0,0 +1,47 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:02
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_existing_reviews(apps, schema_editor):
+    """Summarize the reviews already written, so products don't show "No reviews yet"."""
+    from shop.reviews import SENTIMENT_COUNTS
+
+    Feedback = apps.get_model('shop', 'Feedback')
+    ProductReviewStats = apps.get_model('shop', 'ProductReviewStats')
+    ProductReviewStats.objects.bulk_create([
+        ProductReviewStats(**row)
+        for row in Feedback.objects.values('product_id').annotate(
+            review_count=Count('id'),
+            positive_count=Count('id', filter=Q(sentiment='Positive')),
+            neutral_count=Count('id', filter=Q(sentiment='Neutral')),
+            negative_count=Count('id', filter=Q(sentiment='Negative')),
+            score_sum=Coalesce(Sum('sentiment_score', filter=Q(sentiment__in=SENTIMENT_COUNTS)),
+                               Value(0.0), output_field=FloatField()),
+        ).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0024_productfacetbucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductReviewStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='shop.product')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('positive_count', models.PositiveIntegerField(default=0)),
+                ('neutral_count', models.PositiveIntegerField(default=0)),
+                ('negative_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_reviews, migrations.RunPython.noop),
+    ]
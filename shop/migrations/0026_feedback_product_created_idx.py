@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0025_productreviewstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='feedback_product_created_idx'),
+        ),
+    ]
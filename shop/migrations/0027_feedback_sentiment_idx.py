@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0026_feedback_product_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['sentiment', 'id'], name='feedback_sentiment_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0027_feedback_sentiment_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseheader',
+            index=models.Index(fields=['customer', 'purchase_date', 'id'], name='purchase_customer_date_idx'),
+        ),
+    ]
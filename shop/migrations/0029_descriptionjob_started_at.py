@@ -0,0 +1,26 @@
+# Generated by Django 4.2.19 on 2026-10-18 17:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_running_jobs(apps, schema_editor):
+    """Jobs already running have no claim time; their creation time is the best guess."""
+    DescriptionJob = apps.get_model('shop', 'DescriptionJob')
+    DescriptionJob.objects.filter(status='running').update(started_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0028_purchase_customer_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='descriptionjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_running_jobs, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User  # Use Django's built-in User model
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -40,9 +42,12 @@ class CartItem(models.Model):
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     line_total = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
 
+    class Meta:
+        unique_together = ("cart", "product")  # ✅ One line per product; concurrent adds bump qty
+
     def save(self, *args, **kwargs):
-        # ✅ Ensure cart is saved before calculating totals
-        if not self.cart.pk:
+        # ✅ Ensure cart is saved before calculating totals (cart_id is set once it is)
+        if self.cart_id is None and not self.cart.pk:
             self.cart.save()
 
         self.line_total = (self.price * self.qty) - self.discount
@@ -56,6 +61,15 @@ class PurchaseHeader(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    # ✅ Client-supplied checkout token; retries with the same key replay this purchase
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+
+    class Meta:
+        unique_together = ("customer", "idempotency_key")
+        indexes = [
+            # ✅ Serves the newest-first keyset pages of a customer's purchase history
+            models.Index(fields=["customer", "purchase_date", "id"], name="purchase_customer_date_idx"),
+        ]
 
 class PurchaseDetail(models.Model):
     purchaseHeader = models.ForeignKey(PurchaseHeader, on_delete=models.CASCADE, related_name="details")
@@ -90,6 +104,119 @@ class Feedback(models.Model):
 
     class Meta:
         unique_together = ("customer", "product")  # ✅ Prevent duplicate feedback
+        indexes = [
+            # ✅ Serves the newest-first keyset feed of a product's feedback
+            models.Index(fields=["product", "created_at", "id"], name="feedback_product_created_idx"),
+            # ✅ Finds unscored (sentiment IS NULL) rows for the background scorer
+            models.Index(fields=["sentiment", "id"], name="feedback_sentiment_idx"),
+        ]
 
     def __str__(self):
         return f"Review by {self.customer.user.username} on {self.product}"
+
+class DescriptionJob(models.Model):
+    """A queued AI description generation, processed by the local worker pool."""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    prompt = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    result = models.TextField(blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)  # When a worker claimed it
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Description job {self.id} ({self.status})"
+
+class ProductNeighbor(models.Model):
+    """Top-K co-purchase neighbours of a product, rebuilt offline by ``build_recommendations``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("product", "neighbor")
+
+    def __str__(self):
+        return f"{self.product} → {self.neighbor} ({self.score:.3f})"
+
+class CustomerRecommendation(models.Model):
+    """Materialized recommendations per customer, refreshed on checkout and by ``build_recommendations``."""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="recommendations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommended_to")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("customer", "product")
+        indexes = [models.Index(fields=["customer", "rank"])]
+        ordering = ["customer", "rank"]
+
+    def __str__(self):
+        return f"#{self.rank} {self.product} for {self.customer}"
+
+class StockReservation(models.Model):
+    """A time-limited hold on stock for a cart line; expired holds no longer count."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    qty = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("cart", "product")
+        indexes = [
+            models.Index(fields=["product", "expires_at"]),  # ✅ Active holds per product
+            models.Index(fields=["expires_at"]),  # ✅ Sweeper
+        ]
+
+    def __str__(self):
+        return f"{self.qty} × {self.product} held until {self.expires_at:%Y-%m-%d %H:%M}"
+
+class ProductSearchTerm(models.Model):
+    """Inverted index posting: how often ``term`` occurs in a product's title, code and description."""
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="search_terms")
+    tf = models.PositiveIntegerField()  # Weighted term frequency
+    doc_length = models.PositiveIntegerField()  # Weighted token count of the whole product
+
+    class Meta:
+        unique_together = ("term", "product")  # ✅ Also the index used to look up postings by term
+
+
+class ProductFacetBucket(models.Model):
+    """Precomputed product count for one (price bucket, in stock) cell of the catalogue facets."""
+    price_bucket = models.PositiveSmallIntegerField()  # Index into PRICE_FACET_BOUNDS ranges
+    in_stock = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("price_bucket", "in_stock")
+
+
+class ProductReviewStats(models.Model):
+    """Denormalized review summary of a product, kept in step with its ``Feedback`` rows."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="review_stats")
+    review_count = models.PositiveIntegerField(default=0)
+    positive_count = models.PositiveIntegerField(default=0)
+    neutral_count = models.PositiveIntegerField(default=0)
+    negative_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)  # Sum of sentiment_score over scored reviews
+
+    @property
+    def scored_count(self):
+        return self.positive_count + self.neutral_count + self.negative_count
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.scored_count if self.scored_count else None
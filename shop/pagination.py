@@ -0,0 +1,118 @@
+import base64
+import json
+from dataclasses import dataclass
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ``page_size`` request parameter, bounded to ``1..maximum``."""
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_values(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    values = json.loads(raw)
+    if not isinstance(values, list):
+        raise ValueError("cursor is not a list")
+    return values
+
+
+def decode_cursor(cursor, fields):
+    """Turn a cursor back into typed values for ``fields`` (model fields in ordering order)."""
+    try:
+        values = _decode_values(cursor)
+        if len(values) != len(fields):
+            raise ValueError("cursor has the wrong number of values")
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+        if None in values:
+            raise ValueError("cursor values can't be null")
+        return values
+    except Exception as e:
+        raise InvalidCursor(f"Invalid page cursor: {e}") from None
+
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Seek-method pagination: rows strictly after ``cursor`` in ``ordering``.
+
+    ``ordering`` is a list like ``["-created_at", "-id"]`` whose last field
+    must be unique so the order is total. Each page is an indexed range
+    scan, so late pages cost the same as the first, unlike OFFSET.
+    """
+    names = [name.lstrip("-") for name in ordering]
+    fields = [queryset.model._meta.get_field(name) for name in names]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = decode_cursor(cursor, fields)
+        # ✅ (a, b) > (x, y)  ⇔  a > x OR (a = x AND b > y), with the direction of each column
+        after = Q()
+        for i, name in enumerate(names):
+            lookup = "lt" if ordering[i].startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": values[i]})
+            for previous, value in zip(names[:i], values[:i]):
+                step &= Q(**{previous: value})
+            after |= step
+        queryset = queryset.filter(after)
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([field.value_from_object(last) for field in fields])
+    return KeysetPage(items=items, next_cursor=next_cursor)
+
+
+def paginate_ranked(items, cursor=None, page_size=DEFAULT_PAGE_SIZE, select=None, batch_size=500):
+    """Page an already ranked list (e.g. search hits); the cursor holds the next position.
+
+    ``select`` narrows the list while paging: it is called with consecutive
+    slices of at most ``batch_size`` items and returns the set of those to
+    keep, so a filter costs one query per slice actually read.
+    """
+    offset = 0
+    if cursor:
+        try:
+            [offset] = _decode_values(cursor)
+            if not isinstance(offset, int) or offset < 0:
+                raise ValueError("cursor position must be a non-negative integer")
+        except Exception as e:
+            raise InvalidCursor(f"Invalid page cursor: {e}") from None
+
+    page, position = [], offset
+    while position < len(items):
+        chunk = items[position:position + batch_size]
+        kept = set(chunk) if select is None else select(chunk)
+        for item in chunk:
+            if item in kept:
+                if len(page) == page_size:
+                    return KeysetPage(items=page, next_cursor=encode_cursor([position]))
+                page.append(item)
+            position += 1
+    return KeysetPage(items=page)
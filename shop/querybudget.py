@@ -0,0 +1,130 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """SQL with literals and parameter lists collapsed, so N+1 repeats share one shape."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    """SQL statements executed while recording, grouped by normalized shape."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def duplicates(self, threshold=2):
+        """``{normalized_sql: times}`` for shapes run at least ``threshold`` times."""
+        shapes = Counter(normalize_sql(sql) for sql in self.statements)
+        return {sql: times for sql, times in shapes.most_common() if times >= threshold}
+
+    def summary(self, threshold=2):
+        lines = [f"{self.count} queries"]
+        for sql, times in self.duplicates(threshold).items():
+            lines.append(f"  {times}x {sql[:200]}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def record_queries():
+    """Record every statement run on the default connection (works with DEBUG off)."""
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        yield log
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+    """Fail with ``QueryBudgetExceeded`` if the block runs more than ``max_queries`` statements,
+    or (with ``max_repeats``) repeats one statement shape more than that many times.
+
+    >>> with query_budget(5, max_repeats=1):
+    ...     client.get(url)
+    """
+    with record_queries() as log:
+        yield log
+    repeated = log.duplicates(max_repeats + 1) if max_repeats is not None else {}
+    if log.count > max_queries or repeated:
+        raise QueryBudgetExceeded(f"Budget is {max_queries} queries, ran {log.summary()}")
+
+
+class QueryBudgetMiddleware:
+    """Count SQL per request and log views that exceed their budget or repeat a query.
+
+    ``QUERY_BUDGETS`` maps URL names to their maximum query count
+    (``QUERY_BUDGET_DEFAULT`` applies to the rest; ``None`` means no limit).
+    A statement shape repeated ``QUERY_BUDGET_REPEATS`` times or more is
+    reported as a likely N+1. With ``QUERY_BUDGET_RAISE`` (e.g. in tests)
+    a violation raises instead of logging.
+
+    Works in both sync and async stacks, so async views (the chatbot) run
+    on the event loop instead of holding a thread for the whole request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budgets = getattr(settings, "QUERY_BUDGETS", {})
+        self.default = getattr(settings, "QUERY_BUDGET_DEFAULT", None)
+        self.repeats = getattr(settings, "QUERY_BUDGET_REPEATS", 5)
+        self.strict = getattr(settings, "QUERY_BUDGET_RAISE", False)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as log:
+            response = self.get_response(request)
+        return self.check(request, response, log)
+
+    async def __acall__(self, request):
+        with record_queries() as log:
+            response = await self.get_response(request)
+        return self.check(request, response, log)
+
+    def check(self, request, response, log):
+        """Compare the request's queries with its view's budget; returns ``response``."""
+        match = request.resolver_match
+        name = match.view_name if match else request.path
+        budget = self.budgets.get(name, self.default)
+        repeated = log.duplicates(self.repeats)
+
+        if settings.DEBUG:
+            response["X-Query-Count"] = str(log.count)
+        if (budget is not None and log.count > budget) or repeated:
+            message = f"{name}: budget {budget}, ran {log.summary(self.repeats)}"
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
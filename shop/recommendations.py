@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import CartItem, CustomerRecommendation, Product, ProductNeighbor, PurchaseDetail
+
+RECOMMENDATION_NEIGHBORS = getattr(settings, "RECOMMENDATION_NEIGHBORS", 20)
+CUSTOMER_RECOMMENDATIONS = getattr(settings, "CUSTOMER_RECOMMENDATIONS", 10)
+
+
+def compute_neighbors(pairs, k=RECOMMENDATION_NEIGHBORS):
+    """Top-``k`` item–item cosine similarities from (customer_id, product_id) pairs.
+
+    Builds a sparse binary customer × product matrix ``U`` and takes
+    ``U.T @ U`` as the co-purchase counts, normalised by each product's
+    buyer count. Returns ``{product_id: [(neighbor_id, score), ...]}``.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    customer_ids, product_ids = zip(*pairs)
+    customers, customer_index = np.unique(customer_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+
+    purchases = sparse.csr_matrix(
+        (np.ones(len(pairs)), (customer_index, product_index)),
+        shape=(len(customers), len(products)),
+    )
+    co_purchases = (purchases.T @ purchases).tocsr()
+
+    buyers = np.sqrt(co_purchases.diagonal())
+    co_purchases.setdiag(0)
+    co_purchases.eliminate_zeros()
+
+    neighbors = {}
+    for row in range(co_purchases.shape[0]):
+        start, end = co_purchases.indptr[row], co_purchases.indptr[row + 1]
+        if start == end:
+            continue
+        columns = co_purchases.indices[start:end]
+        scores = co_purchases.data[start:end] / (buyers[row] * buyers[columns])
+        top = np.argsort(-scores, kind="stable")[:k]
+        neighbors[int(products[row])] = [
+            (int(products[columns[i]]), float(scores[i])) for i in top
+        ]
+    return neighbors
+
+
+def rebuild_neighbors(k=RECOMMENDATION_NEIGHBORS, batch_size=1000):
+    """Recompute the whole ``ProductNeighbor`` table from purchase history."""
+    pairs = PurchaseDetail.objects.values_list(
+        "purchaseHeader__customer_id", "product_id").distinct().iterator()
+    neighbors = compute_neighbors(pairs, k)
+
+    rows = [
+        ProductNeighbor(product_id=product_id, neighbor_id=neighbor_id, score=score)
+        for product_id, ranked in neighbors.items()
+        for neighbor_id, score in ranked
+    ]
+    with transaction.atomic():
+        ProductNeighbor.objects.all().delete()
+        ProductNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def _rank(seen, neighbor_rows, limit):
+    """Sum neighbour scores over the seed products, skipping products already seen."""
+    scores = defaultdict(float)
+    for neighbor_id, score in neighbor_rows:
+        if neighbor_id not in seen:
+            scores[neighbor_id] += score
+    top_ids = sorted(scores, key=lambda product_id: (-scores[product_id], product_id))[:limit]
+    return [(product_id, scores[product_id]) for product_id in top_ids]
+
+
+def _ranked_for_customer(customer, limit):
+    seen = set(PurchaseDetail.objects.filter(
+        purchaseHeader__customer=customer).values_list("product_id", flat=True).distinct())
+    seen.update(CartItem.objects.filter(
+        cart__customer=customer).values_list("product_id", flat=True))
+    if not seen:
+        return []
+
+    neighbor_rows = ProductNeighbor.objects.filter(
+        product_id__in=seen).values_list("neighbor_id", "score")
+    return _rank(seen, neighbor_rows, limit)
+
+
+def recommend_for_customer(customer, limit=3):
+    """Products most similar to what the customer has bought or has in their cart.
+
+    Only reads the customer's own history and the stored neighbour lists of
+    those products, so the cost is O(K × history) regardless of catalogue size.
+    """
+    ranked = _ranked_for_customer(customer, limit)
+    products = Product.objects.in_bulk([product_id for product_id, _ in ranked])
+    return [products[product_id] for product_id, _ in ranked if product_id in products]
+
+
+def refresh_customer_recommendations(customer, limit=CUSTOMER_RECOMMENDATIONS):
+    """Recompute one customer's stored recommendations (called after checkout and cart adds)."""
+    rows = [
+        CustomerRecommendation(customer=customer, product_id=product_id, rank=rank, score=score)
+        for rank, (product_id, score) in enumerate(_ranked_for_customer(customer, limit), start=1)
+    ]
+    with transaction.atomic():
+        CustomerRecommendation.objects.filter(customer=customer).delete()
+        CustomerRecommendation.objects.bulk_create(rows)
+    return rows
+
+
+def rebuild_customer_recommendations(limit=CUSTOMER_RECOMMENDATIONS, batch_size=1000):
+    """Recompute every customer's stored recommendations in memory and bulk-insert them."""
+    history = defaultdict(set)
+    for customer_id, product_id in PurchaseDetail.objects.values_list(
+            "purchaseHeader__customer_id", "product_id").distinct().iterator():
+        history[customer_id].add(product_id)
+    for customer_id, product_id in CartItem.objects.values_list(
+            "cart__customer_id", "product_id").iterator():
+        history[customer_id].add(product_id)
+
+    neighbors = defaultdict(list)
+    for product_id, neighbor_id, score in ProductNeighbor.objects.values_list(
+            "product_id", "neighbor_id", "score").iterator():
+        neighbors[product_id].append((neighbor_id, score))
+
+    rows = [
+        CustomerRecommendation(customer_id=customer_id, product_id=product_id, rank=rank, score=score)
+        for customer_id, seen in history.items()
+        for rank, (product_id, score) in enumerate(_rank(
+            seen, (row for seed_id in seen for row in neighbors[seed_id]), limit), start=1)
+    ]
+    with transaction.atomic():
+        CustomerRecommendation.objects.all().delete()
+        CustomerRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def stored_recommendations(customer, limit=3):
+    """Precomputed recommendations for the customer in a single indexed query.
+
+    Products put in the cart since the list was stored are left out.
+    """
+    in_cart = CartItem.objects.filter(cart__customer=customer).values("product_id")
+    return list(Product.objects.filter(recommended_to__customer=customer).exclude(
+        id__in=in_cart).order_by("recommended_to__rank")[:limit])
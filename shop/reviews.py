@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Feedback, ProductReviewStats
+
+SENTIMENT_COUNTS = {"Positive": "positive_count", "Neutral": "neutral_count", "Negative": "negative_count"}
+
+
+def review_key(feedback):
+    """What a feedback row contributes to its product's stats: ``(product_id, sentiment, score)``."""
+    return feedback.product_id, feedback.sentiment, feedback.sentiment_score
+
+
+def _contribution(sentiment, score, sign):
+    deltas = {"review_count": sign}
+    # ✅ Unscored reviews count as reviews but stay out of the mean and the label counts
+    if sentiment in SENTIMENT_COUNTS:
+        deltas[SENTIMENT_COUNTS[sentiment]] = sign
+        deltas["score_sum"] = sign * (score or 0)
+    return deltas
+
+
+def apply_review_change(old_key, new_key):
+    """Move one review's contribution from ``old_key`` to ``new_key`` (``None`` for created/deleted)."""
+    if old_key == new_key:
+        return
+    changes = {}
+    if old_key is not None:
+        changes.setdefault(old_key[0], []).append(_contribution(*old_key[1:], sign=-1))
+    if new_key is not None:
+        changes.setdefault(new_key[0], []).append(_contribution(*new_key[1:], sign=1))
+
+    for product_id, contributions in changes.items():
+        deltas = {}
+        for contribution in contributions:
+            for field, delta in contribution.items():
+                deltas[field] = deltas.get(field, 0) + delta
+        updated = ProductReviewStats.objects.filter(product_id=product_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items() if delta})
+        # ✅ No row yet: recount from the feedback table (skipped for removals, e.g. a cascading product delete)
+        if not updated and new_key is not None and new_key[0] == product_id:
+            refresh_review_stats([product_id])
+
+
+def refresh_review_stats(product_ids=None):
+    """Recompute the stats of ``product_ids`` (every product if ``None``) from ``Feedback``.
+
+    Used as the periodic reconciliation and after bulk writes that bypass
+    signals. Returns the number of products with reviews.
+    """
+    feedbacks = Feedback.objects.all()
+    if product_ids is not None:
+        feedbacks = feedbacks.filter(product_id__in=product_ids)
+    rows = [
+        ProductReviewStats(**row)
+        for row in feedbacks.values("product_id").annotate(
+            review_count=Count("id"),
+            positive_count=Count("id", filter=Q(sentiment="Positive")),
+            neutral_count=Count("id", filter=Q(sentiment="Neutral")),
+            negative_count=Count("id", filter=Q(sentiment="Negative")),
+            score_sum=Coalesce(Sum("sentiment_score", filter=Q(sentiment__in=SENTIMENT_COUNTS)),
+                               Value(0.0), output_field=FloatField()),
+        ).order_by()
+    ]
+    with transaction.atomic():
+        # ✅ Upsert in place: no window where a concurrent insert of the same row collides
+        ProductReviewStats.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True,
+            unique_fields=["product"] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=["review_count", "positive_count", "neutral_count", "negative_count", "score_sum"])
+        stale = ProductReviewStats.objects.exclude(product_id__in=feedbacks.values("product_id"))
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=product_ids)
+        stale.delete()
+    return len(rows)
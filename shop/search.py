@@ -0,0 +1,149 @@
+import hashlib
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+
+from .models import Product, ProductSearchTerm
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the this to with".split())
+
+# ✅ Matches in the title or code count more than matches in the description
+FIELD_WEIGHTS = {"title": 3, "code": 3, "description": 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+STATS_CACHE_KEY = "search:corpus-stats"
+STATS_TIMEOUT = 600
+
+SEARCH_MAX_RESULTS = getattr(settings, "SEARCH_MAX_RESULTS", 1000)  # Best matches kept per query
+RESULTS_TIMEOUT = getattr(settings, "SEARCH_RESULTS_TIMEOUT", 300)
+GENERATION_KEY = "search:generation"
+
+
+def tokenize(text):
+    return [
+        token[:64] for token in TOKEN_RE.findall((text or "").lower())
+        if token not in STOPWORDS
+    ]
+
+
+def product_terms(product):
+    """Weighted term frequencies for a product."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(product, field)):
+            counts[token] += weight
+    return counts
+
+
+def index_product(product):
+    """Replace the product's postings in the inverted index."""
+    counts = product_terms(product)
+    doc_length = sum(counts.values())
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product=product).delete()
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(term=term, product=product, tf=tf, doc_length=doc_length)
+            for term, tf in counts.items()
+        ])
+    invalidate_search_results()
+
+
+def invalidate_search_results():
+    """Retire every cached result list (called whenever the postings change)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+
+
+def rebuild_index(batch_size=1000):
+    """Reindex every product; returns the number of products indexed."""
+    indexed = 0
+    with transaction.atomic():
+        ProductSearchTerm.objects.all().delete()
+        postings = []
+        for product in Product.objects.only("id", "title", "code", "description").iterator(chunk_size=batch_size):
+            counts = product_terms(product)
+            doc_length = sum(counts.values())
+            postings.extend(
+                ProductSearchTerm(term=term, product_id=product.pk, tf=tf, doc_length=doc_length)
+                for term, tf in counts.items()
+            )
+            indexed += 1
+            if len(postings) >= batch_size:
+                ProductSearchTerm.objects.bulk_create(postings)
+                postings = []
+        ProductSearchTerm.objects.bulk_create(postings)
+    cache.delete(STATS_CACHE_KEY)
+    invalidate_search_results()
+    return indexed
+
+
+def corpus_stats():
+    """(document count, average document length), cached for ``STATS_TIMEOUT`` seconds."""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        documents = Product.objects.count()
+        total_length = ProductSearchTerm.objects.aggregate(total=Sum("tf"))["total"] or 0
+        stats = (documents, total_length / documents if documents else 0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_TIMEOUT)
+    return stats
+
+
+def _bm25_score(terms):
+    """Per-posting BM25 contribution as a SQL expression, so ranking runs in the database."""
+    documents, avg_length = corpus_stats()
+    documents = max(documents, 1)
+    avg_length = avg_length or 1
+
+    frequencies = dict(ProductSearchTerm.objects.filter(term__in=terms).values_list(
+        "term").annotate(products=Count("product_id")).order_by())
+    idf = Case(*[
+        When(term=term, then=Value(math.log(1 + (documents - df + 0.5) / (df + 0.5))))
+        for term, df in frequencies.items()
+    ], default=Value(0.0), output_field=FloatField())
+    norm = Value(BM25_K1 * (1 - BM25_B)) + Value(BM25_K1 * BM25_B / avg_length) * F("doc_length")
+    return ExpressionWrapper(idf * Value(BM25_K1 + 1) * F("tf") / (F("tf") + norm), output_field=FloatField())
+
+
+def search_product_ids(query, limit=SEARCH_MAX_RESULTS):
+    """Ids of the ``limit`` best matches, ranked by BM25 over the inverted index.
+
+    Scores are summed and sorted by the database, and the ranked list is
+    cached per set of query terms until the index next changes.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+
+    generation = cache.get_or_set(GENERATION_KEY, 0, None)
+    digest = hashlib.sha1(" ".join(terms).encode()).hexdigest()
+    key = f"search:results:{generation}:{limit}:{digest}"
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = list(ProductSearchTerm.objects.filter(term__in=terms).values("product_id").annotate(
+            score=Sum(_bm25_score(terms)),
+        ).order_by("-score", "product_id").values_list("product_id", flat=True)[:limit])
+        cache.set(key, ranked, RESULTS_TIMEOUT)
+    return ranked
+
+
+def matching_products(query, queryset=None):
+    """Every product matching any term of ``query``, as a queryset (unranked, uncapped)."""
+    queryset = queryset if queryset is not None else Product.objects.all()
+    return queryset.filter(pk__in=ProductSearchTerm.objects.filter(
+        term__in=set(tokenize(query))).values("product_id"))
+
+
+def search_products(query, limit=SEARCH_MAX_RESULTS, queryset=None):
+    """Products matching ``query``, best match first (loaded from ``queryset`` if given)."""
+    ranked = search_product_ids(query, limit)
+    products = (queryset if queryset is not None else Product.objects.all()).in_bulk(ranked)
+    return [products[product_id] for product_id in ranked if product_id in products]
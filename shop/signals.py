@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import autocomplete_index
+from .facets import facet_key, move_product
+from .models import CartItem, Feedback, Product
+from .recommendations import refresh_customer_recommendations
+from .reviews import apply_review_change, refresh_review_stats, review_key
+from .search import index_product, invalidate_search_results
+
+REVIEW_FIELDS = {"product_id", "sentiment", "sentiment_score"}
+UNKNOWN = object()
+
+
+@receiver(post_init, sender=Product)
+def remember_facet_key(sender, instance, **kwargs):
+    """Snapshot the facet cell the product was loaded in (unknown if price or qty is deferred)."""
+    values = instance.__dict__
+    instance._facet_key = (
+        facet_key(values["price"], values["qty"])
+        if instance.pk is not None and values.get("price") is not None and values.get("qty") is not None
+        else None
+    )
+
+
+@receiver(pre_save, sender=Product)
+def load_facet_key(sender, instance, **kwargs):
+    if instance.pk is not None and instance._facet_key is None:
+        stored = Product.objects.filter(pk=instance.pk).values_list("price", "qty").first()
+        instance._facet_key = facet_key(*stored) if stored else None
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    """Keep the search index and facet counts in step with product edits (postings cascade on delete)."""
+    index_product(instance)
+
+    new_key = facet_key(instance.price, instance.qty)
+    move_product(instance._facet_key, new_key)
+    instance._facet_key = new_key
+
+    if autocomplete_index.built_at is not None:
+        transaction.on_commit(lambda: autocomplete_index.add(instance.pk, instance.title, instance.code))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    invalidate_search_results()
+    if instance._facet_key is not None:
+        move_product(instance._facet_key, None)
+    if autocomplete_index.built_at is not None:
+        product_id = instance.pk
+        transaction.on_commit(lambda: autocomplete_index.remove(product_id))
+
+
+@receiver(post_init, sender=Feedback)
+def remember_review_key(sender, instance, **kwargs):
+    """Snapshot the review's contribution as loaded (``UNKNOWN`` if a needed field is deferred)."""
+    if instance.pk is None:
+        instance._review_key = None
+    elif REVIEW_FIELDS.issubset(instance.__dict__):
+        instance._review_key = review_key(instance)
+    else:
+        instance._review_key = UNKNOWN
+
+
+@receiver(post_save, sender=Feedback)
+def update_review_stats(sender, instance, **kwargs):
+    """Move the review's contribution in its product's summary (see ``shop.reviews``)."""
+    new_key = review_key(instance)
+    if instance._review_key is UNKNOWN:
+        refresh_review_stats([instance.product_id])
+    else:
+        apply_review_change(instance._review_key, new_key)
+    instance._review_key = new_key
+
+
+@receiver(post_delete, sender=Feedback)
+def remove_review_stats(sender, instance, **kwargs):
+    if instance._review_key is UNKNOWN:
+        refresh_review_stats([instance.product_id])
+    else:
+        apply_review_change(instance._review_key, None)
+
+
+@receiver(post_save, sender=CartItem)
+def refresh_cart_recommendations(sender, instance, created, **kwargs):
+    """A product new to the cart seeds the customer's stored recommendations."""
+    if created:
+        transaction.on_commit(lambda: refresh_customer_recommendations(instance.cart.customer))
@@ -1,6 +1,8 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.contrib.auth.models import User
-from shop.models import Product, Customer, PurchaseHeader, PurchaseDetail
+from shop.models import Product, Customer, PurchaseHeader, PurchaseDetail, Cart, CartItem
+from shop.recommendations import (
+    rebuild_customer_recommendations, rebuild_neighbors, refresh_customer_recommendations, stored_recommendations)
 from shop.services import recommend_products_for_user  # Import recommendation function
 
 class RecommendationTests(TestCase):
@@ -15,25 +17,1175 @@ class RecommendationTests(TestCase):
         self.product2 = Product.objects.create(code="P002", description="Product 2", price=20.0, qty=5)
         self.product3 = Product.objects.create(code="P003", description="Product 3", price=30.0, qty=15)
 
-        # ✅ Ensure we are using the correct foreign key name from PurchaseDetail model
-        purchase_header = PurchaseHeader.objects.create(customer=self.customer, total=60)
+        # ✅ testuser bought product1; other customers bought it together with product2/product3
+        other_user = User.objects.create_user(username="otheruser", password="password123")
+        other_customer = Customer.objects.create(user=other_user, email="otheruser@email.com")
+        third_user = User.objects.create_user(username="thirduser", password="password123")
+        third_customer = Customer.objects.create(user=third_user, email="thirduser@email.com")
 
+        self._purchase(self.customer, self.product1)
+        self._purchase(other_customer, self.product1, self.product2)
+        self._purchase(third_customer, self.product1, self.product2, self.product3)
+
+        rebuild_neighbors()
+
+    def _purchase(self, customer, *products):
         # ✅ Fix: Use the correct field name `purchaseHeader`
-        PurchaseDetail.objects.create(
-            purchaseHeader=purchase_header, product=self.product1, description="Test Desc 1", qty=1, price=10, line_total=10
-        )
-        PurchaseDetail.objects.create(
-            purchaseHeader=purchase_header, product=self.product2, description="Test Desc 2", qty=1, price=20, line_total=20
-        )
-        PurchaseDetail.objects.create(
-            purchaseHeader=purchase_header, product=self.product3, description="Test Desc 3", qty=1, price=30, line_total=30
-        )
+        purchase_header = PurchaseHeader.objects.create(
+            customer=customer, total=sum(product.price for product in products))
+        for product in products:
+            PurchaseDetail.objects.create(
+                purchaseHeader=purchase_header, product=product, description=product.description,
+                qty=1, price=product.price, line_total=product.price
+            )
 
     def test_recommend_products_for_user(self):
         """Test if the recommendation function returns relevant products"""
         recommendations = recommend_products_for_user(self.user)
 
         self.assertGreater(len(recommendations), 0, "❌ No recommendations returned!")
-        self.assertIn(self.product1, recommendations, "❌ Product1 should be recommended!")
-        self.assertIn(self.product2, recommendations, "❌ Product2 should be recommended!")
-        print("✅ Recommendation test passed successfully!")
+        self.assertNotIn(self.product1, recommendations, "❌ Already purchased products shouldn't be recommended!")
+        self.assertEqual(recommendations, [self.product2, self.product3], "❌ Most co-purchased product should come first!")
+
+    def test_cart_items_seed_recommendations(self):
+        """Products in the cart count as history for customers without purchases"""
+        new_user = User.objects.create_user(username="newuser", password="password123")
+        new_customer = Customer.objects.create(user=new_user, email="newuser@email.com")
+        cart = Cart.objects.create(customer=new_customer)
+        CartItem.objects.create(cart=cart, product=self.product3, qty=1, price=self.product3.price)
+
+        self.assertEqual(recommend_products_for_user(new_user), [self.product2, self.product1])
+
+    def test_checkout_refreshes_stored_recommendations(self):
+        """Checking out recomputes the buyer's precomputed recommendations"""
+        buyer = User.objects.create_user(username="buyer", password="password123")
+        customer = Customer.objects.create(user=buyer, email="buyer@email.com")
+        cart = Cart.objects.create(customer=customer, total=self.product3.price)
+        CartItem.objects.create(cart=cart, product=self.product3, qty=1, price=self.product3.price)
+        self.assertEqual(stored_recommendations(customer), [])
+
+        self.client.force_login(buyer)
+        self.client.post("/checkout/")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(stored_recommendations(customer), [self.product2, self.product1])
+
+    def test_stored_recommendations_skip_cart_products(self):
+        """Products added to the cart are never recommended and reseed the stored list"""
+        refresh_customer_recommendations(self.customer)
+        self.assertEqual(stored_recommendations(self.customer), [self.product2, self.product3])
+
+        cart = Cart.objects.create(customer=self.customer)
+        CartItem.objects.create(cart=cart, product=self.product2, qty=1, price=self.product2.price)
+        with self.assertNumQueries(1):
+            self.assertEqual(stored_recommendations(self.customer), [self.product3])
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/cart/add/{self.product3.id}/", {}, content_type="application/json")
+        self.assertFalse(self.customer.recommendations.exists())
+
+    def test_full_rebuild_matches_live_recommendations(self):
+        """The bulk rebuild stores the same ranking the live engine computes"""
+        rebuild_customer_recommendations()
+        self.assertEqual(stored_recommendations(self.customer), recommend_products_for_user(self.user))
+
+
+class ModelRegistryTests(TestCase):
+
+    def test_models_load_lazily_and_are_shared(self):
+        """A registered model is only built on first use and then reused"""
+        from shop.ai_models import ModelRegistry
+
+        calls = []
+        registry = ModelRegistry()
+        registry.register("fake", lambda: calls.append(1) or object())
+
+        self.assertFalse(registry.is_loaded("fake"))
+        first = registry.get("fake")
+        self.assertIs(registry.get("fake"), first)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("load_seconds", registry.stats()["fake"])
+
+    def test_memory_fallback_measures_current_rss(self):
+        """Models without weights are sized by the RSS they add, even below an earlier peak"""
+        import sys
+        from shop.ai_models import ModelRegistry
+
+        if not sys.platform.startswith("linux"):
+            self.skipTest("needs /proc/self/statm")
+        peak = bytearray(64 * 1024 * 1024)
+        del peak
+
+        registry = ModelRegistry()
+        registry.register("blob", lambda: bytearray(32 * 1024 * 1024))
+        registry.get("blob")
+        self.assertGreater(registry.stats()["blob"]["memory_bytes"], 16 * 1024 * 1024)
+
+    def test_optional_models_are_not_warmed_by_default(self):
+        """warm() skips models registered with warm=False unless they are named"""
+        from shop.ai_models import ModelRegistry
+
+        registry = ModelRegistry()
+        registry.register("core", object)
+        registry.register("optional", object, warm=False)
+
+        registry.warm()
+        self.assertFalse(registry.is_loaded("optional"))
+        registry.warm(["optional"])
+        self.assertTrue(registry.is_loaded("optional"))
+
+
+class MicroBatcherTests(TestCase):
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Requests submitted together are run as one batch and fanned back out"""
+        from concurrent.futures import ThreadPoolExecutor
+        from shop.inference import MicroBatcher
+
+        batches = []
+
+        def upper(items):
+            batches.append(list(items))
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(upper, max_batch_size=4, max_wait=0.2)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(batcher.submit, ["a", "b", "c", "d"]))
+
+        self.assertEqual(results, ["A", "B", "C", "D"])
+        self.assertLess(len(batches), 4)
+
+
+class DescriptionJobQueueTests(TestCase):
+
+    def test_job_runs_and_status_endpoint_returns_result(self):
+        """Enqueued jobs are processed by the worker and exposed via the status URL"""
+        from django.urls import reverse
+        from shop.jobs import DescriptionJobQueue
+        from shop.models import DescriptionJob
+
+        job_queue = DescriptionJobQueue(lambda prompt: f"{prompt} description", max_depth=5)
+        with self.captureOnCommitCallbacks(execute=False):
+            job = job_queue.enqueue("Yoga mat")
+        job_queue.run(job.id)
+
+        response = self.client.get(reverse("description_job_status", args=[job.id]))
+        self.assertEqual(response.json()["status"], DescriptionJob.DONE)
+        self.assertEqual(response.json()["description"], "Yoga mat description")
+
+    def test_full_queue_rejects_new_jobs(self):
+        """Enqueueing beyond the depth limit raises QueueFull"""
+        from shop.jobs import DescriptionJobQueue, QueueFull
+
+        job_queue = DescriptionJobQueue(lambda prompt: prompt, max_depth=1)
+        with self.captureOnCommitCallbacks(execute=False):
+            job_queue.enqueue("first")
+            with self.assertRaises(QueueFull):
+                job_queue.enqueue("second")
+
+
+    def test_orphaned_jobs_are_recovered_on_first_use(self):
+        """Pending jobs are resubmitted, stale running jobs fail and old finished jobs are pruned"""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from shop.jobs import DescriptionJobQueue
+        from shop.models import DescriptionJob
+
+        long_ago = timezone.now() - timedelta(days=2)
+        pending = DescriptionJob.objects.create(prompt="pending")
+        stuck = DescriptionJob.objects.create(prompt="stuck", status=DescriptionJob.RUNNING)
+        running = DescriptionJob.objects.create(prompt="running", status=DescriptionJob.RUNNING)
+        old = DescriptionJob.objects.create(prompt="old", status=DescriptionJob.DONE, finished_at=long_ago)
+        DescriptionJob.objects.filter(id=stuck.id).update(started_at=long_ago)
+        DescriptionJob.objects.filter(id=running.id).update(created_at=long_ago, started_at=timezone.now())
+
+        job_queue = DescriptionJobQueue(lambda prompt: prompt, max_depth=5)
+        with mock.patch.object(job_queue, "_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=False):
+                job_queue.enqueue("new")
+                job_queue.enqueue("another")  # ✅ Recovery only runs once
+
+        executor.return_value.submit.assert_called_once_with(job_queue._run_in_thread, pending.id)
+        self.assertEqual(DescriptionJob.objects.get(id=stuck.id).status, DescriptionJob.FAILED)
+        self.assertEqual(DescriptionJob.objects.get(id=running.id).status, DescriptionJob.RUNNING)
+        self.assertFalse(DescriptionJob.objects.filter(id=old.id).exists())
+
+    def test_stale_jobs_free_a_full_queue(self):
+        """A queue filled by jobs whose worker died accepts new work once they go stale"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop.jobs import DescriptionJobQueue
+        from shop.models import DescriptionJob
+
+        job_queue = DescriptionJobQueue(lambda prompt: prompt, max_depth=1)
+        job_queue._recovered = True
+        DescriptionJob.objects.create(
+            prompt="orphan", status=DescriptionJob.RUNNING, started_at=timezone.now() - timedelta(hours=1))
+
+        with self.captureOnCommitCallbacks(execute=False):
+            job = job_queue.enqueue("new")
+        self.assertEqual(job.status, DescriptionJob.PENDING)
+
+    def test_staleness_counts_from_the_claim(self):
+        """A job that queued for long isn't failed once it runs, and a failed job stays failed"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop.jobs import DescriptionJobQueue
+        from shop.models import DescriptionJob
+
+        def generate(prompt):
+            self.assertEqual(job_queue.fail_stale(), 0)  # ✅ Waited an hour, but claimed just now
+            DescriptionJob.objects.filter(prompt="late").update(started_at=timezone.now() - timedelta(hours=1))
+            job_queue.fail_stale()
+            return f"{prompt} description"
+
+        job_queue = DescriptionJobQueue(generate)
+        job = DescriptionJob.objects.create(prompt="late")
+        DescriptionJob.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        job_queue.run(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DescriptionJob.FAILED)
+        self.assertEqual(job.result, "")
+
+
+class DescriptionBatchTests(TestCase):
+
+    def test_new_tokens_do_not_depend_on_the_batch(self):
+        """Batches ask for a number of new tokens, so padding and prompt length don't eat into them"""
+        from types import SimpleNamespace
+        from shop.ai_models import registry
+        from shop.inference import DESCRIPTION_PARAMS, _generate_descriptions
+
+        calls = []
+
+        def generator(prompts, **params):
+            calls.append(params)
+            return [[{"generated_text": prompt + " ..."}] for prompt in prompts]
+
+        generator.tokenizer = SimpleNamespace(pad_token_id=None, padding_side="right")
+        generator.model = SimpleNamespace(config=SimpleNamespace(eos_token_id=50256))
+        original = registry._loaders["description"]
+        registry.register("description", lambda: generator)
+        registry.unload("description")
+        self.addCleanup(registry.unload, "description")
+        self.addCleanup(registry.register, "description", original)
+
+        self.assertEqual(_generate_descriptions(["Mat", "A very long prompt " * 20]),
+                         ["Mat ...", "A very long prompt " * 20 + " ..."])
+        self.assertNotIn("max_length", calls[0])
+        self.assertEqual(calls[0]["max_new_tokens"], DESCRIPTION_PARAMS["max_new_tokens"])
+        self.assertEqual(generator.tokenizer.padding_side, "left")
+
+
+class ResultCacheTests(TestCase):
+
+    def test_repeat_prompt_is_served_from_cache(self):
+        """Only the first request for identical inputs runs the model"""
+        import uuid
+        from shop.ai_cache import ResultCache
+
+        cache = ResultCache(f"test-{uuid.uuid4()}", timeout=60)
+        calls = []
+        compute = lambda: calls.append(1) or "A sturdy yoga mat."
+        params = {"max_length": 50}
+
+        cache.get_or_compute("gpt2", "Yoga mat", compute, params=params)
+        cache.clear_local()
+        self.assertEqual(cache.get_or_compute("gpt2", "Yoga mat", compute, params=params), "A sturdy yoga mat.")
+        cache.get_or_compute("gpt2", "Yoga mat", compute, params={"max_length": 80})
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+
+class ChatbotTests(TestCase):
+
+    def setUp(self):
+        import uuid
+        from unittest import mock
+        from shop import chatbot
+        from shop.ai_cache import ResultCache
+
+        self.chatbot = chatbot
+        chatbot.set_backend(chatbot.FakeBackend())
+        self.addCleanup(chatbot.set_backend, None)
+
+        patcher = mock.patch.object(chatbot, "chatbot_cache", ResultCache(f"test-{uuid.uuid4()}"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_stream_endpoint_sends_chunks_as_events(self):
+        """The streaming view emits one SSE event per backend chunk"""
+        response = await self.async_client.post(
+            "/chatbot/stream/", {"message": "hello there"}, content_type="application/json")
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn('data: {"text": "hello "}', body)
+        self.assertTrue(body.endswith("event: done\ndata: {}\n\n"))
+
+    async def test_slow_backend_times_out(self):
+        """Answers that exceed the timeout raise ChatbotTimeout"""
+        self.chatbot.set_backend(self.chatbot.FakeBackend(delay=0.2))
+        with self.assertRaises(self.chatbot.ChatbotTimeout):
+            await self.chatbot.answer("hello", timeout=0.1)
+
+    async def test_identical_prompts_share_one_upstream_call(self):
+        """Concurrent near-identical prompts are coalesced and later ones hit the cache"""
+        import asyncio
+
+        calls = []
+
+        class CountingBackend(self.chatbot.FakeBackend):
+            def stream(self, prompt):
+                calls.append(prompt)
+                return super().stream(prompt)
+
+        self.chatbot.set_backend(CountingBackend(delay=0.05))
+        answers = await asyncio.gather(
+            self.chatbot.answer("What is your return policy?"),
+            self.chatbot.answer("what is your  return policy"),
+        )
+        await self.chatbot.answer("WHAT IS YOUR RETURN POLICY!")
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(answers[0], answers[1])
+
+    async def test_cancelled_waiter_does_not_break_the_shared_answer(self):
+        """A waiter that disconnects leaves the leader and other waiters unaffected"""
+        import asyncio
+
+        self.chatbot.set_backend(self.chatbot.FakeBackend(delay=0.05))
+        leader = asyncio.ensure_future(self.chatbot.answer("shipping times?"))
+        await asyncio.sleep(0.01)
+        quitter = asyncio.ensure_future(self.chatbot.answer("Shipping times"))
+        patient = asyncio.ensure_future(self.chatbot.answer("shipping  times"))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+
+        self.assertEqual(await leader, await patient)
+        self.assertTrue(quitter.cancelled())
+
+    async def test_leader_disconnect_does_not_fail_waiters(self):
+        """The upstream call outlives the client that started it; waiters still get the answer"""
+        import asyncio
+
+        self.chatbot.set_backend(self.chatbot.FakeBackend(delay=0.05))
+        stream = self.chatbot.stream_answer("gift wrapping?")
+        first = await stream.__anext__()
+        waiter = asyncio.ensure_future(self.chatbot.answer("Gift wrapping"))
+        await asyncio.sleep(0.01)
+        await stream.aclose()  # ✅ The leader's client goes away mid-stream
+
+        self.assertEqual(await waiter, "You said: gift wrapping? ")
+        self.assertEqual(first, "You ")
+        self.assertEqual(await self.chatbot.answer("gift wrapping"), "You said: gift wrapping? ")
+
+
+class SentimentTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reviewer", password="password123")
+        self.customer = Customer.objects.create(user=self.user, email="reviewer@email.com")
+        self.product = Product.objects.create(code="S001", description="Speaker", price=25, qty=5)
+
+    def test_submitted_feedback_is_scored_in_the_background(self):
+        """submit_feedback saves the row unscored and the scoring worker labels it"""
+        from unittest import mock
+        from shop.jobs import feedback_scoring
+        from shop.models import Feedback
+
+        self.client.force_login(self.user)
+        with mock.patch.object(feedback_scoring, "_schedule") as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    f"/feedback/submit_feedback/{self.product.id}/",
+                    {"comments": "I love this speaker, the sound is great!", "sentiment": "Negative"},
+                    content_type="application/json")
+        schedule.assert_called_once()
+
+        feedback = Feedback.objects.get(customer=self.customer)
+        self.assertIsNone(feedback.sentiment)
+        self.assertEqual(feedback_scoring.lag()[0], 1)
+
+        self.assertEqual(feedback_scoring.drain(), 1)
+        feedback.refresh_from_db()
+        self.assertGreater(feedback.sentiment_score, 0.05)
+        self.assertEqual(feedback.sentiment, "Positive")
+        self.assertEqual(feedback_scoring.lag(), (0, 0.0))
+        self.assertEqual(self.product.review_stats.positive_count, 1)
+
+    def test_transformer_backend_scores_length_sorted_batches(self):
+        """The transformer backend feeds shortest-first batches and maps label scores back in order"""
+        from shop.ai_models import registry
+        from shop.utils import label_texts
+
+        calls = []
+
+        def classifier(texts, batch_size, truncation, top_k):
+            calls.append((list(texts), batch_size))
+            return [
+                [{"label": "POSITIVE", "score": 0.9}, {"label": "NEGATIVE", "score": 0.1}] if "good" in text
+                else [{"label": "POSITIVE", "score": 0.3}, {"label": "NEGATIVE", "score": 0.7}]
+                for text in texts
+            ]
+
+        original = registry._loaders["sentiment-transformer"]
+        registry.register("sentiment-transformer", lambda: classifier, warm=False)
+        self.addCleanup(registry.register, "sentiment-transformer", original, warm=False)
+        self.addCleanup(registry.unload, "sentiment-transformer")
+
+        results = label_texts(["a really good product overall", "bad", "good"], backend="transformer")
+
+        self.assertEqual(calls[0][0], ["bad", "good", "a really good product overall"])
+        self.assertEqual([label for _, label in results], ["Positive", "Neutral", "Positive"])
+        self.assertAlmostEqual(results[1][0], -0.4)
+
+    def test_backfill_command_rescores_all_feedback(self):
+        """score_feedback rescores existing rows in chunks"""
+        from io import StringIO
+        from django.core.management import call_command
+        from shop.models import Feedback
+
+        other = Product.objects.create(code="S002", description="Mat", price=10, qty=5)
+        Feedback.objects.create(customer=self.customer, product=self.product, comments="Terrible, it broke.")
+        Feedback.objects.create(customer=self.customer, product=other, comments="Wonderful mat!")
+
+        call_command("score_feedback", "--batch-size", "1", stdout=StringIO())
+
+        self.assertEqual(
+            dict(Feedback.objects.values_list("product__code", "sentiment")),
+            {"S001": "Negative", "S002": "Positive"},
+        )
+
+
+class StartupTests(TestCase):
+
+    def test_importing_views_loads_no_heavy_libraries(self):
+        """Importing the URLconf must not pull in transformers, NLTK or the Gemini SDK"""
+        import os
+        import subprocess
+        import sys
+
+        script = (
+            "import sys, django; django.setup(); import ecommerce.urls; "
+            "print(','.join(m for m in ('transformers', 'nltk', 'google.generativeai') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, env=os.environ.copy(), check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+class CartTotalsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="password123")
+        self.customer = Customer.objects.create(user=self.user, email="shopper@email.com")
+        self.cart = Cart.objects.create(customer=self.customer)
+
+    def test_totals_use_constant_queries(self):
+        """Recalculating totals costs the same two queries regardless of cart size"""
+        from decimal import Decimal
+        from shop.cart import recalculate_cart_totals
+
+        for i in range(10):
+            product = Product.objects.create(code=f"C{i:03}", description="Item", price=5, qty=10)
+            CartItem.objects.create(cart=self.cart, product=product, qty=2, price=product.price, discount=1)
+
+        with self.assertNumQueries(2):
+            recalculate_cart_totals(self.cart)
+
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, Decimal("100.00"))
+        self.assertEqual(self.cart.discount, Decimal("10.00"))
+
+
+class AddToCartConcurrencyTests(TransactionTestCase):
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_parallel_adds_lose_no_increments(self):
+        """Hundreds of concurrent add_to_cart calls end with the exact quantity"""
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connection
+        from shop.cart import add_product_to_cart
+
+        user = User.objects.create_user(username="racer", password="password123")
+        customer = Customer.objects.create(user=user, email="racer@email.com")
+        cart = Cart.objects.create(customer=customer)
+        product = Product.objects.create(code="R001", description="Racer", price=2, qty=1000)
+
+        def add(_):
+            try:
+                add_product_to_cart(Cart.objects.get(pk=cart.pk), product)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(add, range(200)))
+
+        item = CartItem.objects.get(cart=cart, product=product)
+        cart.refresh_from_db()
+        self.assertEqual(item.qty, 200)
+        self.assertEqual(item.line_total, 400)
+        self.assertEqual(cart.total, 400)
+
+    def test_add_to_cart_view_query_count(self):
+        """Adding an existing product costs a small, fixed number of queries"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        user = User.objects.create_user(username="counter", password="password123")
+        customer = Customer.objects.create(user=user, email="counter@email.com")
+        product = Product.objects.create(code="R002", description="Counter", price=2, qty=10)
+        self.client.force_login(user)
+        self.client.post(f"/cart/add/{product.id}/", {}, content_type="application/json")
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(f"/cart/add/{product.id}/", {}, content_type="application/json")
+        statements = [
+            query["sql"] for query in context.captured_queries
+            if query["sql"].split()[0] in ("SELECT", "INSERT", "UPDATE", "DELETE")
+        ]
+
+        # session, user, customer, product, cart, cart lock, line qty,
+        # product lock, held by others, hold update, increment, aggregate, cart update
+        self.assertEqual(len(statements), 13)
+        self.assertEqual(response.json()["total"], "4.00")
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="checkout", password="password123")
+        self.customer = Customer.objects.create(user=self.user, email="checkout@email.com")
+        self.cart = Cart.objects.create(customer=self.customer)
+        self.products = [
+            Product.objects.create(code=f"K{i:03}", description=f"Item {i}", price=3, qty=5)
+            for i in range(50)
+        ]
+        for product in self.products:
+            CartItem.objects.create(cart=self.cart, product=product, qty=2, price=product.price)
+        from shop.cart import recalculate_cart_totals
+        recalculate_cart_totals(self.cart)
+
+    def test_large_cart_checks_out_in_a_handful_of_queries(self):
+        """A 50-line cart is checked out with a fixed number of queries"""
+        from shop.checkout import checkout_cart
+
+        # cart lock, items, stock lock, other holds, decrement, header, details,
+        # clear items, release holds, reset cart (+ savepoint and release)
+        with self.assertNumQueries(12):
+            purchase = checkout_cart(self.customer)
+
+        self.assertEqual(purchase.details.count(), 50)
+        self.assertEqual(purchase.total, 300)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.assertEqual(set(Product.objects.values_list("qty", flat=True)), {3})
+
+    def test_oversell_fails_without_writing_anything(self):
+        """Asking for more than is in stock rolls the whole checkout back"""
+        from shop.checkout import OutOfStock, checkout_cart
+
+        CartItem.objects.filter(product=self.products[0]).update(qty=6)
+
+        with self.assertRaises(OutOfStock) as raised:
+            checkout_cart(self.customer)
+
+        self.assertEqual(raised.exception.products, [self.products[0]])
+        self.assertEqual(set(Product.objects.values_list("qty", flat=True)), {5})
+        self.assertFalse(PurchaseHeader.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 50)
+
+
+class StockReservationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(code="F001", title="Flash deal", description="Deal", price=1, qty=20)
+
+    def _customer(self, name):
+        user = User.objects.create(username=name)
+        return Customer.objects.create(user=user, email=f"{name}@email.com")
+
+    def test_holds_block_other_carts_until_they_expire(self):
+        """Stock held by one cart can't be added by another until the hold is swept"""
+        from django.utils import timezone
+        from shop.cart import add_product_to_cart
+        from shop.inventory import InsufficientStock, available_to_sell, expire_reservations
+        from shop.models import StockReservation
+
+        first = Cart.objects.create(customer=self._customer("first"))
+        second = Cart.objects.create(customer=self._customer("second"))
+        add_product_to_cart(first, self.product, qty=15)
+
+        self.assertEqual(available_to_sell(self.product), 5)
+        with self.assertRaises(InsufficientStock):
+            add_product_to_cart(second, self.product, qty=6)
+
+        StockReservation.objects.update(expires_at=timezone.now())
+        self.assertEqual(expire_reservations(), 1)
+        add_product_to_cart(second, self.product, qty=6)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_parallel_carts_never_oversell(self):
+        """Many carts racing for the last units get exactly the stock there is"""
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connection
+        from shop.cart import add_product_to_cart
+        from shop.inventory import InsufficientStock, available_to_sell
+
+        carts = [Cart.objects.create(customer=self._customer(f"flash{i}")) for i in range(60)]
+
+        def add(cart):
+            try:
+                add_product_to_cart(cart, self.product)
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            results = list(pool.map(add, carts))
+
+        self.assertEqual(results.count(True), 20)
+        self.assertEqual(available_to_sell(self.product), 0)
+
+
+class IdempotentCheckoutTests(TestCase):
+
+    def test_retried_checkout_replays_the_first_purchase(self):
+        """Posting checkout twice with the same key creates a single order"""
+        user = User.objects.create_user(username="retrier", password="password123")
+        customer = Customer.objects.create(user=user, email="retrier@email.com")
+        product = Product.objects.create(code="I001", description="Item", price=4, qty=5)
+        cart = Cart.objects.create(customer=customer, total=8)
+        CartItem.objects.create(cart=cart, product=product, qty=2, price=product.price)
+
+        self.client.force_login(user)
+        for _ in range(2):
+            response = self.client.post("/checkout/", {"idempotency_key": "token-1"})
+            self.assertRedirects(response, "/purchase-history/", fetch_redirect_response=False)
+
+        self.assertEqual(PurchaseHeader.objects.filter(customer=customer).count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.qty, 3)
+
+    def test_long_keys_are_stored_as_a_digest(self):
+        """Keys longer than the column are accepted and still match their retry"""
+        from shop.checkout import checkout_cart
+
+        customer = Customer.objects.create(user=User.objects.create(username="long-key"), email="long@email.com")
+        product = Product.objects.create(code="I002", description="Item", price=4, qty=5)
+        cart = Cart.objects.create(customer=customer, total=4)
+        CartItem.objects.create(cart=cart, product=product, qty=1, price=product.price)
+
+        key = "k" * 200
+        purchase = checkout_cart(customer, idempotency_key=key)
+        self.assertEqual(len(purchase.idempotency_key), 64)
+        self.assertEqual(checkout_cart(customer, idempotency_key=key), purchase)
+
+
+class ProductSearchTests(TestCase):
+
+    def setUp(self):
+        self.speaker = Product.objects.create(
+            code="BT-100", title="Bluetooth Speaker", description="Portable speaker with deep bass", price=30, qty=5)
+        self.mat = Product.objects.create(
+            code="YM-200", title="Yoga Mat", description="Non-slip mat, pairs well with a bluetooth speaker", price=20, qty=5)
+        self.bulb = Product.objects.create(
+            code="LB-300", title="Smart LED Bulb", description="Dimmable bulb", price=10, qty=5)
+
+    def test_title_matches_rank_above_description_matches(self):
+        """Search covers title, code and description, ranking title hits first"""
+        from shop.search import search_products
+
+        self.assertEqual(search_products("bluetooth speaker"), [self.speaker, self.mat])
+        self.assertEqual(search_products("lb 300"), [self.bulb])
+        self.assertEqual(search_products("the"), [])
+
+    def test_every_match_is_returned(self):
+        """Searches aren't capped at a fixed number of results"""
+        from shop.search import search_product_ids
+
+        for i in range(60):
+            Product.objects.create(code=f"LP-{i}", title=f"Lamp {i}", description="", price=5, qty=1)
+        self.assertEqual(len(search_product_ids("lamp")), 60)
+        self.assertEqual(len(search_product_ids("lamp", limit=10)), 10)
+
+    def test_index_follows_product_edits_and_deletes(self):
+        """Saving or deleting a product updates the index"""
+        from shop.search import search_products
+
+        self.bulb.title = "Smart Lamp"
+        self.bulb.save()
+        self.assertEqual(search_products("lamp"), [self.bulb])
+
+        self.bulb.delete()
+        self.assertEqual(search_products("lamp"), [])
+
+
+class ProductListingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="shopper")
+        self.client.force_login(self.user)
+        self.products = [
+            Product.objects.create(code=f"P-{i}", title=f"Product {i}", description="word " * 500, price=i, qty=1)
+            for i in range(5)
+        ]
+
+    def test_feed_walks_every_product_once(self):
+        """Following next links visits each product exactly once, in id order"""
+        from django.urls import reverse
+
+        seen, url = [], reverse("product_feed") + "?page_size=2"
+        while url:
+            data = self.client.get(url).json()
+            seen += [item["id"] for item in data["products"]]
+            self.assertTrue(all(len(item["summary"].split()) <= 16 for item in data["products"]))
+            url = data["next"]
+        self.assertEqual(seen, [product.id for product in self.products])
+
+    def test_bad_cursor(self):
+        """A tampered cursor is rejected by the feed and restarts the HTML listing"""
+        from django.urls import reverse
+
+        self.assertEqual(self.client.get(reverse("product_feed") + "?after=%%%").status_code, 400)
+        self.assertRedirects(self.client.get(reverse("product_list") + "?after=%%%"), reverse("product_list"))
+
+    def test_null_cursor_values_are_rejected(self):
+        """A well-formed cursor holding nulls is invalid rather than a server error"""
+        from django.urls import reverse
+        from shop.pagination import encode_cursor
+
+        for values in ([None], [None, None]):
+            after = encode_cursor(values)
+            self.assertEqual(self.client.get(reverse("product_feed"), {"after": after}).status_code, 400)
+            self.assertRedirects(self.client.get(reverse("product_list"), {"after": after}), reverse("product_list"))
+        Customer.objects.create(user=self.user, email="shopper@example.com")
+        response = self.client.get(reverse("purchase_history"), {"after": encode_cursor([None, None])})
+        self.assertNotEqual(response.status_code, 500)
+
+    def test_search_results_are_paged_too(self):
+        """All ranked matches are reachable through next links, in the HTML and the feed"""
+        from django.urls import reverse
+
+        for i in range(31):
+            Product.objects.create(code=f"G-{i}", title=f"Garden hose {i}", description="", price=9, qty=1)
+
+        response = self.client.get(reverse("product_list"), {"query": "hose"})
+        self.assertEqual(len(response.context["products"]), 24)
+        response = self.client.get(reverse("product_list") + "?" + response.context["next_params"])
+        self.assertEqual(len(response.context["products"]), 7)
+        self.assertIsNone(response.context["next_cursor"])
+
+        seen, url = [], reverse("product_feed") + "?query=hose&page_size=10"
+        while url:
+            data = self.client.get(url).json()
+            seen += [item["id"] for item in data["products"]]
+            url = data["next"]
+        self.assertEqual(len(set(seen)), 31)
+
+    def test_search_page_cost_does_not_grow_with_matches(self):
+        """Ranking and facet counts run in the database and the ranked list is cached per query"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+        from shop.search import rebuild_index
+
+        Product.objects.bulk_create([
+            Product(code=f"H-{i}", title=f"Hose {i}", description="garden hose", price=9 + i % 50, qty=i % 2)
+            for i in range(1500)
+        ])
+        rebuild_index()
+
+        response = self.client.get(reverse("product_list"), {"query": "hose", "in_stock": 1})
+        self.assertEqual(len(response.context["products"]), 24)
+        self.assertEqual(response.context["facets"]["in_stock"], 750)
+        self.assertEqual(sum(option["count"] for option in response.context["facets"]["price"]), 750)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("product_list") + "?" + response.context["next_params"])
+        self.assertEqual(len(response.context["products"]), 24)
+        postings = [q["sql"] for q in ctx.captured_queries if "shop_productsearchterm" in q["sql"]]
+        self.assertEqual(len(postings), 1)  # ✅ Only the facet aggregate; the ranking came from the cache
+
+    def test_listing_skips_full_descriptions(self):
+        """The page loads a description prefix, not the whole column"""
+        from django.urls import reverse
+
+        response = self.client.get(reverse("product_list") + "?page_size=2")
+        products = response.context["products"]
+        self.assertEqual(len(products), 2)
+        self.assertTrue(response.context["next_cursor"])
+        self.assertIn("description", products[0].get_deferred_fields())
+        self.assertEqual(len(products[0].summary), 300)
+
+
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        from shop.autocomplete import AutocompleteIndex
+
+        self.index = AutocompleteIndex(max_products=3).build([
+            (1, "Bluetooth Speaker", "BT-100"),
+            (2, "Yoga Mat", "YM-200"),
+            (3, "Smart LED Bulb", "LB-300"),
+        ])
+
+    def test_prefix_and_typo_matches(self):
+        """Prefixes match directly; misspellings within edit distance 1–2 still match"""
+        self.assertEqual([r[0] for r in self.index.suggest("blue")], [1])
+        self.assertEqual([r[0] for r in self.index.suggest("spekaer")], [1])
+        self.assertEqual([r[0] for r in self.index.suggest("yoga matt")], [2])
+        self.assertEqual([r[0] for r in self.index.suggest("lb-3")], [3])
+        self.assertEqual(self.index.suggest("xylophone"), [])
+
+    def test_incremental_updates_and_memory_bound(self):
+        """Edits replace a product's terms, deletes free them, and the size cap holds"""
+        self.index.add(3, "Smart Lamp", "LB-300")
+        self.assertEqual(self.index.suggest("bulb"), [])
+        self.assertEqual([r[0] for r in self.index.suggest("lamp")], [3])
+
+        self.index.add(4, "Desk Lamp", "DL-400")
+        self.assertEqual(self.index.stats()["dropped"], 1)
+        self.index.remove(3)
+        self.assertEqual(self.index.suggest("lamp"), [])
+        self.assertEqual(self.index.stats()["products"], 2)
+        self.assertGreater(self.index.stats()["bytes"], 0)
+
+    def test_rebuild_serves_old_index_and_keeps_concurrent_edits(self):
+        """suggest() answers from the old index during a rebuild and edits made meanwhile survive it"""
+        def rows():
+            yield 1, "Bluetooth Speaker", "BT-100"
+            self.assertEqual([r[0] for r in self.index.suggest("yoga")], [2])  # ✅ Not blocked
+            self.index.add(5, "Desk Lamp", "DL-500")
+            self.index.remove(1)
+
+        self.index.build(rows())
+        self.assertEqual([r[0] for r in self.index.suggest("lamp")], [5])
+        self.assertEqual(self.index.suggest("speaker"), [])
+        self.assertEqual(self.index.suggest("yoga"), [])
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        """Lookups keep using a stale index while a single background thread rebuilds it"""
+        import threading
+        import time
+        from unittest import mock
+        from shop import autocomplete
+
+        release, threads = threading.Event(), []
+
+        def slow_rebuild():
+            threads.append(threading.current_thread().name)
+            release.wait(5)
+            autocomplete.autocomplete_index.built_at = time.monotonic()
+
+        autocomplete.autocomplete_index.built_at = time.monotonic() - autocomplete.AUTOCOMPLETE_MAX_AGE - 1
+        self.addCleanup(setattr, autocomplete.autocomplete_index, "built_at", None)
+        with mock.patch.object(autocomplete, "rebuild_autocomplete_index", slow_rebuild):
+            self.assertIs(autocomplete.get_autocomplete_index(), autocomplete.autocomplete_index)
+            self.assertIs(autocomplete.get_autocomplete_index(), autocomplete.autocomplete_index)
+            release.set()
+            with autocomplete._rebuild_lock:  # ✅ Held until the background rebuild finishes
+                pass
+        self.assertEqual(threads, ["autocomplete-rebuild"])
+
+    def test_endpoint_follows_product_saves(self):
+        """The endpoint's shared index picks up products saved after it was built"""
+        from django.urls import reverse
+        from shop.autocomplete import rebuild_autocomplete_index
+
+        self.client.force_login(User.objects.create(username="shopper"))
+        rebuild_autocomplete_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(code="HP-1", title="Wireless Headphones", description="", price=50, qty=3)
+
+        results = self.client.get(reverse("product_autocomplete"), {"q": "wirless head"}).json()["results"]
+        self.assertEqual([r["id"] for r in results], [product.id])
+
+
+class ProductFacetTests(TestCase):
+
+    def setUp(self):
+        self.cheap = Product.objects.create(code="F-1", title="Pen", description="", price=5, qty=3)
+        self.mid = Product.objects.create(code="F-2", title="Mug", description="", price=12, qty=0)
+        self.dear = Product.objects.create(code="F-3", title="Lamp", description="", price=300, qty=1)
+
+    def counts(self, **filters):
+        from shop.facets import facet_counts
+
+        facets = facet_counts(**filters)
+        return [option["count"] for option in facets["price"]], facets["in_stock"]
+
+    def test_counts_follow_price_and_stock_changes(self):
+        """Saves, deletes and sell-outs at checkout move products between buckets"""
+        from shop.checkout import checkout_cart
+        from shop.facets import rebuild_facet_counts
+
+        self.assertEqual(self.counts(), ([1, 1, 0, 0, 0, 1], 2))
+        self.assertEqual(self.counts(in_stock=True), ([1, 0, 0, 0, 0, 1], 2))
+        self.assertEqual(self.counts(bucket=0)[1], 1)
+
+        self.mid.price, self.mid.qty = 60, 4
+        self.mid.save()
+        self.dear.delete()
+        self.assertEqual(self.counts(), ([1, 0, 0, 1, 0, 0], 2))
+
+        customer = Customer.objects.create(user=User.objects.create(username="facets"), email="f@example.com")
+        cart = Cart.objects.create(customer=customer)
+        CartItem.objects.create(cart=cart, product=self.cheap, qty=3, price=self.cheap.price)
+        checkout_cart(customer)
+        self.assertEqual(self.counts(in_stock=True), ([0, 0, 0, 1, 0, 0], 1))
+
+        before = self.counts()
+        rebuild_facet_counts()
+        self.assertEqual(self.counts(), before)
+
+    def test_missing_cells_never_go_negative(self):
+        """Moving a product out of a cell that doesn't exist doesn't create a negative count"""
+        from shop.models import ProductFacetBucket
+
+        ProductFacetBucket.objects.all().delete()
+        self.cheap.price = 60
+        self.cheap.save()
+        self.assertEqual(self.counts(), ([0, 0, 0, 1, 0, 0], 1))
+
+    def test_listing_filters_with_one_count_query(self):
+        """Filtering the listing costs the page query plus a single facet read"""
+        from django.urls import reverse
+
+        self.client.force_login(User.objects.create(username="shopper"))
+        self.client.get(reverse("product_list"))  # session and user lookups warm up
+        with self.assertNumQueries(4):  # session, user, products, facet cells
+            response = self.client.get(reverse("product_list"), {"price": 0, "in_stock": 1})
+        self.assertEqual(list(response.context["products"]), [self.cheap])
+
+        response = self.client.get(reverse("product_list"), {"query": "mug", "in_stock": 1})
+        self.assertEqual(list(response.context["products"]), [])
+        response = self.client.get(reverse("product_list"), {"query": "mug"})
+        self.assertEqual(list(response.context["products"]), [self.mid])
+        self.assertEqual([option["count"] for option in response.context["facets"]["price"]][:2], [0, 1])
+        self.assertEqual(response.context["facets"]["in_stock"], 0)
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        from shop.models import Feedback
+
+        self.product = Product.objects.create(code="Q-1", title="Kettle", description="", price=20, qty=10)
+        customers = [
+            Customer.objects.create(user=User.objects.create(username=f"critic{i}"), email=f"c{i}@example.com")
+            for i in range(6)
+        ]
+        for customer in customers:
+            Feedback.objects.create(customer=customer, product=self.product, comments="Fine", sentiment="Neutral")
+        self.customer = customers[0]
+        self.client.force_login(self.customer.user)
+
+    def test_normalized_duplicates(self):
+        """Statements differing only in literals are grouped as one repeated shape"""
+        from shop.querybudget import QueryBudgetExceeded, normalize_sql, query_budget
+
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 7 AND name = 'x' AND pk IN (%s, %s)"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)",
+        )
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with query_budget(10, max_repeats=1):
+                for customer in Customer.objects.all():
+                    customer.user.username
+        self.assertIn("6x SELECT", str(raised.exception))
+
+    async def test_async_views_stay_on_the_event_loop(self):
+        """The middleware is async-capable, so async views aren't pushed onto a worker thread"""
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from shop.querybudget import QueryBudgetMiddleware
+
+        async def view(request):
+            return HttpResponse("ok")
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/chatbot/"))
+        self.assertEqual(response.content, b"ok")
+        self.assertFalse(iscoroutinefunction(QueryBudgetMiddleware(lambda request: response)))
+
+    def test_feedback_and_purchase_pages_stay_within_budget(self):
+        """Per-row author and product lookups are joined instead of queried one by one"""
+        from django.conf import settings
+        from django.test import override_settings
+        from django.urls import reverse
+
+        purchase = PurchaseHeader.objects.create(customer=self.customer, total=40)
+        for i in range(5):
+            product = Product.objects.create(code=f"Q-{i + 2}", title=f"Cup {i}", description="", price=8, qty=1)
+            PurchaseDetail.objects.create(purchaseHeader=purchase, product=product, description="", qty=1, price=8, line_total=8)
+
+        with override_settings(QUERY_BUDGET_RAISE=True, QUERY_BUDGET_REPEATS=2):
+            for name, args in [("view_feedback", [self.product.id]), ("product_detail", [self.product.id]),
+                               ("purchase_details", [purchase.id])]:
+                response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Cup 4")
+        self.assertIn("purchase_details", settings.QUERY_BUDGETS)
+
+
+class ReviewStatsTests(TestCase):
+
+    def setUp(self):
+        from shop.models import Feedback
+
+        self.product = Product.objects.create(code="R-1", title="Blender", description="", price=40, qty=5)
+        self.customers = [
+            Customer.objects.create(user=User.objects.create(username=f"reviewer{i}"), email=f"r{i}@example.com")
+            for i in range(3)
+        ]
+        self.good = Feedback.objects.create(
+            customer=self.customers[0], product=self.product, comments="Great", sentiment="Positive", sentiment_score=0.8)
+        self.bad = Feedback.objects.create(
+            customer=self.customers[1], product=self.product, comments="Awful", sentiment="Negative", sentiment_score=-0.6)
+        self.pending = Feedback.objects.create(customer=self.customers[2], product=self.product, comments="Hmm")
+
+    def stats(self):
+        from shop.models import ProductReviewStats
+
+        stats = ProductReviewStats.objects.get(product=self.product)
+        return (stats.review_count, stats.positive_count, stats.neutral_count, stats.negative_count,
+                round(stats.mean_score, 6))
+
+    def test_stats_follow_feedback_writes(self):
+        """Creating, rescoring and deleting feedback keep the summary current"""
+        from shop.models import Feedback
+        from shop.reviews import refresh_review_stats
+
+        self.assertEqual(self.stats(), (3, 1, 0, 1, 0.1))
+
+        self.pending.sentiment, self.pending.sentiment_score = "Neutral", 0.0
+        self.pending.save()
+        self.bad.delete()
+        self.assertEqual(self.stats(), (2, 1, 1, 0, 0.4))
+
+        deferred = Feedback.objects.only("id", "comments").get(pk=self.good.pk)
+        deferred.comments = "Still great"
+        deferred.save()
+        self.assertEqual(self.stats(), (2, 1, 1, 0, 0.4))
+
+        before = self.stats()
+        refresh_review_stats()
+        self.assertEqual(self.stats(), before)
+
+    def test_refresh_upserts_and_drops_products_without_reviews(self):
+        """Reconciliation fixes drifted rows in place and removes stats of products with no reviews left"""
+        from shop.models import Feedback, ProductReviewStats
+        from shop.reviews import refresh_review_stats
+
+        quiet = Product.objects.create(code="R-2", title="Kettle", description="", price=20, qty=5)
+        ProductReviewStats.objects.create(product=quiet, review_count=4)
+        ProductReviewStats.objects.filter(product=self.product).update(review_count=99)
+
+        self.assertEqual(refresh_review_stats([self.product.id, quiet.id]), 1)
+        self.assertEqual(self.stats(), (3, 1, 0, 1, 0.1))
+        self.assertFalse(ProductReviewStats.objects.filter(product=quiet).exists())
+
+        Feedback.objects.all().delete()
+        self.assertEqual(refresh_review_stats(), 0)
+        self.assertFalse(ProductReviewStats.objects.exists())
+
+    def test_pages_show_summary_without_reading_feedback(self):
+        """The product listing renders review summaries without querying Feedback"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        self.client.force_login(self.customers[0].user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("product_list"))
+        self.assertContains(response, "3 reviews")
+        self.assertFalse(any("shop_feedback" in query["sql"] for query in ctx.captured_queries))
+
+
+class FeedbackFeedTests(TestCase):
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from shop.models import Feedback
+
+        self.product = Product.objects.create(code="FF-1", title="Toaster", description="", price=25, qty=5)
+        now = timezone.now()
+        for i in range(7):
+            customer = Customer.objects.create(user=User.objects.create(username=f"fan{i}"), email=f"f{i}@example.com")
+            feedback = Feedback.objects.create(customer=customer, product=self.product, comments=f"Review {i}")
+            # ✅ Two reviews share a timestamp so the id tie-break is exercised
+            Feedback.objects.filter(pk=feedback.pk).update(created_at=now - timedelta(minutes=i // 2 * 2))
+        self.client.force_login(customer.user)
+
+    def test_json_feed_pages_newest_first(self):
+        """Following next links returns every review once, newest first, in constant queries"""
+        from django.urls import reverse
+        from shop.querybudget import query_budget
+
+        seen, url = [], reverse("product_feedback_feed", args=[self.product.id]) + "?page_size=3"
+        while url:
+            with query_budget(4, max_repeats=1):
+                data = self.client.get(url).json()
+            seen += [item["comments"] for item in data["feedback"]]
+            url = data["next"]
+
+        self.assertEqual(seen, [f"Review {i}" for i in (1, 0, 3, 2, 5, 4, 6)])
+
+    def test_pages_show_a_bounded_slice(self):
+        """The feedback page and product page render only the first slice"""
+        from django.urls import reverse
+
+        response = self.client.get(reverse("view_feedback", args=[self.product.id]), {"page_size": 4})
+        self.assertEqual(len(response.context["feedbacks"]), 4)
+        self.assertTrue(response.context["next_cursor"])
+
+        response = self.client.get(reverse("product_detail", args=[self.product.id]),
+                                   {"after": "garbage", "page_size": 100})
+        self.assertEqual(len(response.context["feedbacks"]), 5)
+        self.assertContains(response, "See all feedback")
+        self.assertContains(response, f"<title>{self.product.title}</title>")
+
+        response = self.client.get(reverse("view_feedback", args=[self.product.id]))
+        self.assertContains(response, "<title>Product Feedback</title>")
+
+
+class PurchaseHistoryTests(TestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(user=User.objects.create(username="regular"), email="r@example.com")
+        product = Product.objects.create(code="PH-1", title="Tea", description="", price=4, qty=100)
+        self.purchases = []
+        for i in range(5):
+            purchase = PurchaseHeader.objects.create(customer=self.customer, total=4 * (i + 1))
+            PurchaseDetail.objects.bulk_create([
+                PurchaseDetail(purchaseHeader=purchase, product=product, description="", qty=2, price=4, line_total=8)
+                for _ in range(i + 1)
+            ])
+            self.purchases.append(purchase)
+        self.client.force_login(self.customer.user)
+
+    def test_history_pages_newest_first_with_item_counts(self):
+        """Each page is one grouped query; following the cursor reaches the oldest purchase"""
+        from django.urls import reverse
+        from shop.querybudget import query_budget
+
+        seen, params = [], {"page_size": 2}
+        while True:
+            with query_budget(4):  # session, user, customer, page with counts
+                response = self.client.get(reverse("purchase_history"), params)
+            seen += [(header.id, header.item_count, header.unit_count) for header in response.context["purchase_headers"]]
+            if not response.context["next_cursor"]:
+                break
+            params = {"page_size": 2, "after": response.context["next_cursor"]}
+
+        self.assertEqual(seen, [(p.id, i + 1, 2 * (i + 1)) for i, p in reversed(list(enumerate(self.purchases)))])
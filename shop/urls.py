@@ -20,15 +20,20 @@ urlpatterns = [
 
     # 🔹 Products
     path('products/', views.list_products, name='product_list'),
+    path('products/feed/', views.product_feed, name='product_feed'),
+    path('products/autocomplete/', views.autocomplete_products, name='product_autocomplete'),
     path('products/add/', views.create_product, name='create_product'),
     path('products/<int:product_id>/edit/', views.update_product, name='update_product'),
     path('products/<int:product_id>/delete/', views.delete_product, name='delete_product'),
     path("products/<int:product_id>/", views.product_detail, name="product_detail"),
     path('products/<int:product_id>/feedback/', view_feedback, name='view_feedback'),
+    path('products/<int:product_id>/feedback/feed/', views.product_feedback_feed, name='product_feedback_feed'),
 
     # 🔹 AI-Generated Product Descriptions
     path('generate-description/', views.generate_description, name='generate_description'),
+    path('generate-description/jobs/<uuid:job_id>/', views.description_job_status, name='description_job_status'),
     path('chatbot/', views.chatbot_response, name='chatbot'),
+    path('chatbot/stream/', views.chatbot_stream, name='chatbot_stream'),
 
 
     # 🔹 Purchase History
@@ -1,19 +1,84 @@
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
+from django.conf import settings
+
+from .ai_models import SENTIMENT_BACKEND, registry
+
+VADER_NEUTRAL_BAND = 0.05  # Conventional VADER compound cut-off
+
+SENTIMENT_BATCH_SIZE = getattr(settings, "SENTIMENT_BATCH_SIZE", 32)
+# ✅ Classifier polarities cluster near ±1, so the transformer's neutral band is wider than VADER's
+TRANSFORMER_NEUTRAL_BAND = getattr(settings, "SENTIMENT_TRANSFORMER_NEUTRAL_BAND", 0.5)
+
+
+def get_sentiment_analyzer():
+    """Shared VADER analyzer (one per process, loaded on first use)."""
+    return registry.get("vader")
+
+
+def sentiment_label(score, threshold=VADER_NEUTRAL_BAND):
+    """Map a compound score to a ``Feedback.SENTIMENT_CHOICES`` key."""
+    if score >= threshold:
+        return "Positive"
+    if score <= -threshold:
+        return "Negative"
+    return "Neutral"
+
+
+def _vader_scores(texts):
+    sia = get_sentiment_analyzer()
+    return [sia.polarity_scores(text or "")["compound"] for text in texts]
+
+
+def _polarity(labels):
+    """P(positive) - P(negative) from a classifier's per-label scores, in [-1, 1]."""
+    polarity = 0.0
+    for label in labels:
+        name = label["label"].lower()
+        if name.startswith("pos"):
+            polarity += label["score"]
+        elif name.startswith("neg"):
+            polarity -= label["score"]
+    return polarity
+
+
+def _transformer_scores(texts):
+    classifier = registry.get("sentiment-transformer")
+    # ✅ Length-sorted batches pad each batch only up to its own longest review
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i] or ""))
+    outputs = classifier(
+        [texts[i] or "" for i in order], batch_size=SENTIMENT_BATCH_SIZE, truncation=True, top_k=None)
+    scores = [0.0] * len(texts)
+    for i, labels in zip(order, outputs):
+        scores[i] = _polarity(labels)
+    return scores
+
+
+SENTIMENT_BACKENDS = {
+    "vader": (_vader_scores, VADER_NEUTRAL_BAND),
+    "transformer": (_transformer_scores, TRANSFORMER_NEUTRAL_BAND),
+}
+
+
+def score_texts(texts, backend=None):
+    """Sentiment scores in [-1, 1] for a batch of texts, using ``SENTIMENT_BACKEND`` by default."""
+    scorer, _ = SENTIMENT_BACKENDS[backend or SENTIMENT_BACKEND]
+    return scorer(list(texts))
+
+
+def label_texts(texts, backend=None):
+    """``(score, label)`` pairs for a batch of texts."""
+    backend = backend or SENTIMENT_BACKEND
+    threshold = SENTIMENT_BACKENDS[backend][1]
+    return [(score, sentiment_label(score, threshold)) for score in score_texts(texts, backend)]
+
+
+def score_feedbacks(feedbacks, backend=None):
+    """Set ``sentiment_score`` and ``sentiment`` on a batch of feedback objects (not saved)."""
+    for feedback, (score, label) in zip(feedbacks, label_texts([f.comments for f in feedbacks], backend)):
+        feedback.sentiment_score = score
+        feedback.sentiment = label
+    return feedbacks
 
-nltk.download('vader_lexicon')
 
 def analyze_sentiment(feedback):
     """Analyzes sentiment of feedback comments and assigns a score."""
-    sia = SentimentIntensityAnalyzer()
-    score = sia.polarity_scores(feedback.comments)["compound"]
-
-    # Assign a sentiment category
-    if score >= 0.05:
-        feedback.sentiment = "Positive 😀"
-    elif score <= -0.05:
-        feedback.sentiment = "Negative 😞"
-    else:
-        feedback.sentiment = "Neutral 😐"
-
-    feedback.sentiment_score = score  # Store numeric sentiment score
+    score_feedbacks([feedback])
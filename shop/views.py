@@ -1,15 +1,17 @@
 #  Standard Library Imports
 # import openai
 import json
-# Third-Party Library Imports
-import google.generativeai as genai
-from transformers import pipeline
+import uuid
 
 # Django Core Imports
-from django.conf import settings
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.db.models import Count, Sum
+from django.db.models.functions import Left
+from django.utils.http import urlencode
+from django.utils.text import Truncator
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
@@ -18,18 +20,26 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import user_passes_test
 
 # Local Imports (App-Specific)
-from .models import Customer, Product, Cart, CartItem, PurchaseHeader, PurchaseDetail, Feedback
+from .models import Customer, Product, Cart, CartItem, PurchaseHeader, PurchaseDetail, Feedback, DescriptionJob
 from .forms import UserRegistrationForm, CustomerForm, ProductForm, FeedbackForm, CartItemForm
-from .services import recommend_products_for_user
-from .utils import analyze_sentiment
+from .cart import add_product_to_cart, recalculate_cart_totals
+from .checkout import CheckoutError, checkout_cart
+from .inventory import InsufficientStock, release, reserve
+from .search import matching_products, search_product_ids
+from .autocomplete import get_autocomplete_index
+from .facets import facet_counts, filter_products, parse_price_bucket
+from .pagination import InvalidCursor, clamp_page_size, keyset_paginate, paginate_ranked
+from .recommendations import refresh_customer_recommendations, stored_recommendations
+from . import chatbot
+from .inference import generate_description_text
+from .jobs import QueueFull, description_jobs, feedback_scoring
 from shop.forms import FeedbackForm
 from shop.models import Product, Customer, Feedback, Cart, CartItem, PurchaseHeader, PurchaseDetail
 
-
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
-# Load Hugging Face pipeline globally (avoid reloading per request)
-description_generator = pipeline('text-generation', model='gpt2')
+SUMMARY_CHARS = 300  # Enough description for truncatewords:15 on listing cards
+FEEDBACK_PAGE_SIZE = 20
+PRODUCT_FEEDBACK_PREVIEW = 5  # Latest reviews shown on the product page
+PURCHASE_HISTORY_PAGE_SIZE = 20
 
 # ----------------- 🔹 USER AUTHENTICATION VIEWS 🔹 -----------------
 
@@ -208,8 +218,8 @@ def delete_customer(request, pk):
 # ----------------- 🔹 PRODUCT RECOMMENDATION & GENERATION 🔹 -----------------
 
 
-@csrf_exempt
-def chatbot_response(request):
+async def chatbot_response(request):
+    """Answer a chatbot message in one JSON response."""
     if request.method == "POST":
         try:
             data = json.loads(request.body)
@@ -218,24 +228,55 @@ def chatbot_response(request):
             if not user_input:
                 return JsonResponse({"error": "Message cannot be empty"}, status=400)
 
-            # ✅ Use the correct Gemini model
-            model = genai.GenerativeModel("models/gemini-1.5-pro-latest")
-            response = model.generate_content(user_input)
+            # ✅ Shared Gemini client, bounded by CHATBOT_TIMEOUT
+            response_text = await chatbot.answer(user_input)
 
-            return JsonResponse({"response": response.text})
+            return JsonResponse({"response": response_text})
 
+        except chatbot.ChatbotTimeout as e:
+            return JsonResponse({"error": str(e)}, status=504)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 
+async def chatbot_stream(request):
+    """Stream a chatbot answer to the browser as Server-Sent Events."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        user_input = json.loads(request.body).get("message", "")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+
+    if not user_input:
+        return JsonResponse({"error": "Message cannot be empty"}, status=400)
+
+    async def events():
+        try:
+            async for chunk in chatbot.stream_answer(user_input):
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # ✅ Don't let nginx buffer the stream
+    return response
+
+
+# ✅ csrf_exempt() in Django 4.2 wraps views in a sync function, so mark the async views directly
+chatbot_response.csrf_exempt = True
+chatbot_stream.csrf_exempt = True
+
+
 def generate_product_description(name):
     """Generate AI-based product descriptions."""
     prompt = f"Write a product description for {name}:"
-    result = description_generator(
-        prompt, max_length=50, num_return_sequences=1)
-    return result[0]['generated_text']
+    return generate_description_text(prompt)
 
 
 @csrf_exempt  # Disable CSRF protection for this view)
@@ -247,16 +288,31 @@ def generate_description(request):
             if request.content_type == "application/json":
                 data = json.loads(request.body)
                 prompt = data.get('prompt', '')
+                run_async = data.get('async') in (True, "1", "true")
             else:
                 prompt = request.POST.get('prompt', '')
+                run_async = request.POST.get('async') in ("1", "true")
 
             if not prompt:
                 return JsonResponse({"error": "Prompt is required."}, status=400)
 
-            # ✅ Use Hugging Face GPT-2 model to generate text
-            generator = pipeline('text-generation', model='gpt2')
-            result = generator(prompt, max_length=50, num_return_sequences=1)
-            generated_description = result[0]['generated_text']
+            # ✅ Background mode: return a job id immediately, poll the status URL
+            if run_async:
+                try:
+                    job = description_jobs.enqueue(prompt)
+                except QueueFull as e:
+                    response = JsonResponse({"error": str(e)}, status=429)
+                    response["Retry-After"] = "5"
+                    return response
+
+                return JsonResponse({
+                    "job_id": str(job.id),
+                    "status": job.status,
+                    "status_url": reverse("description_job_status", args=[job.id]),
+                }, status=202)
+
+            # ✅ Batched with concurrent requests on the shared GPT-2 pipeline
+            generated_description = generate_description_text(prompt)
 
             return JsonResponse({"description": generated_description})
 
@@ -266,6 +322,17 @@ def generate_description(request):
     return JsonResponse({"error": "Invalid request method."}, status=405)
 
 
+def description_job_status(request, job_id):
+    """Poll the status of a background description job."""
+    job = get_object_or_404(DescriptionJob, id=job_id)
+    payload = {"job_id": str(job.id), "status": job.status}
+    if job.status == DescriptionJob.DONE:
+        payload["description"] = job.result
+    elif job.status == DescriptionJob.FAILED:
+        payload["error"] = job.error
+    return JsonResponse(payload)
+
+
 @login_required
 def create_product(request):
     """ Allow only superusers to add products """
@@ -284,12 +351,119 @@ def create_product(request):
     return render(request, "products/product_form.html", {"form": form})
 
 
+def _product_cards():
+    """Products with only the columns the listing cards render.
+
+    ``summary`` is a prefix of the description, which is plenty for
+    ``truncatewords:15`` and keeps long descriptions out of the page query.
+    """
+    return Product.objects.only("id", "code", "title", "price", "qty", "image").select_related(
+        "review_stats").annotate(summary=Left("description", SUMMARY_CHARS))
+
+
+def _catalog_filters(request):
+    """Search, facet and page-size parameters of a catalogue request."""
+    return {
+        'query': request.GET.get('query', ''),
+        'price': parse_price_bucket(request.GET.get('price')),
+        'in_stock': request.GET.get('in_stock') == '1',
+        'page_size': clamp_page_size(request.GET.get('page_size')),
+    }
+
+
+def _filter_params(filters, **changes):
+    """Query-string parameters reproducing ``filters`` (with ``changes`` applied)."""
+    filters = {**filters, **changes}
+    params = {'query': filters['query'], 'price': filters['price'],
+              'in_stock': '1' if filters['in_stock'] else '', 'page_size': filters['page_size']}
+    return {key: value for key, value in params.items() if value not in ('', None)}
+
+
+def _product_page(filters, cursor=None):
+    """One page of products for ``filters``, plus the search matches' queryset when searching."""
+    if filters['query']:
+        # ✅ Ranked lookup in the inverted index instead of a LIKE scan over descriptions
+        ranked = search_product_ids(filters['query'])
+
+        def select(ids):
+            return set(filter_products(Product.objects.filter(pk__in=ids), filters['price'],
+                                       filters['in_stock']).values_list('pk', flat=True))
+
+        # ✅ The cursor is a position in the ranked list; facets are applied one batch of ids at a time
+        page = paginate_ranked(ranked, cursor=cursor, page_size=filters['page_size'], select=select)
+        cards = _product_cards().in_bulk(page.items)
+        page.items = [cards[pk] for pk in page.items if pk in cards]
+        return page, matching_products(filters['query'])
+    products = filter_products(_product_cards(), filters['price'], filters['in_stock'])
+    return keyset_paginate(products, ["id"], cursor=cursor, page_size=filters['page_size']), None
+
+
 @login_required
 def list_products(request):
-    query = request.GET.get('query', '')
-    products = Product.objects.filter(
-        description__icontains=query) if query else Product.objects.all()
-    return render(request, 'product_list.html', {'products': products})
+    filters = _catalog_filters(request)
+    try:
+        page, matches = _product_page(filters, cursor=request.GET.get('after'))
+    except InvalidCursor:
+        return redirect('product_list')
+
+    # ✅ Counts come from the precomputed facet cells (or one aggregate over the matches), not a COUNT per facet
+    facets = facet_counts(filters['price'], filters['in_stock'], queryset=matches)
+    for option in facets['price']:
+        option['url'] = '?' + urlencode(_filter_params(
+            filters, price=None if option['selected'] else option['bucket']))
+    facets['in_stock_url'] = '?' + urlencode(_filter_params(filters, in_stock=not filters['in_stock']))
+
+    return render(request, 'product_list.html', {
+        'products': page.items,
+        'next_cursor': page.next_cursor,
+        'next_params': urlencode({**_filter_params(filters), 'after': page.next_cursor or ''}),
+        'facets': facets,
+        'filters': filters,
+    })
+
+
+@login_required
+def product_feed(request):
+    """JSON page of products for infinite scroll; follow ``next`` until it is null."""
+    filters = _catalog_filters(request)
+    try:
+        page, _ = _product_page(filters, cursor=request.GET.get('after'))
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    next_url = None
+    if page.has_next:
+        next_url = f"{reverse('product_feed')}?{urlencode({**_filter_params(filters), 'after': page.next_cursor})}"
+
+    return JsonResponse({
+        "products": [
+            {
+                "id": product.id,
+                "code": product.code,
+                "title": product.title,
+                "summary": Truncator(product.summary).words(15),
+                "price": str(product.price),
+                "image": product.image.url if product.image else None,
+                "url": reverse("product_detail", args=[product.id]),
+            }
+            for product in page.items
+        ],
+        "next": next_url,
+    })
+
+
+@login_required
+def autocomplete_products(request):
+    """Title/code suggestions for the search box, tolerant of small typos."""
+    suggestions = get_autocomplete_index().suggest(request.GET.get('q', ''), limit=clamp_page_size(
+        request.GET.get('limit'), default=8, maximum=20))
+    return JsonResponse({
+        "results": [
+            {"id": product_id, "title": title, "code": code, "url": reverse("product_detail", args=[product_id])}
+            for product_id, title, code in suggestions
+        ]
+    })
+
 
 @login_required
 def update_product(request, product_id):
@@ -331,10 +505,20 @@ def purchase_history(request):
     except Customer.DoesNotExist:
         return render(request, 'error.html', {'message': "No customer profile found."})
 
-    purchase_headers = PurchaseHeader.objects.filter(
-        customer=customer).order_by('-purchase_date')
+    # ✅ Line and unit counts come from the same grouped query as the page of headers
+    purchases = PurchaseHeader.objects.filter(customer=customer).annotate(
+        item_count=Count('details'), unit_count=Sum('details__qty'))
+    try:
+        page = keyset_paginate(
+            purchases, ['-purchase_date', '-id'], cursor=request.GET.get('after'),
+            page_size=clamp_page_size(request.GET.get('page_size'), default=PURCHASE_HISTORY_PAGE_SIZE))
+    except InvalidCursor:
+        return redirect('purchase_history')
 
-    return render(request, 'purchase_history.html', {'purchase_headers': purchase_headers})
+    return render(request, 'purchase_history.html', {
+        'purchase_headers': page.items,
+        'next_cursor': page.next_cursor,
+    })
 
 
 @login_required
@@ -343,7 +527,7 @@ def purchase_details(request, purchase_id):
     purchase_header = get_object_or_404(
         PurchaseHeader, id=purchase_id, customer=request.user.customer)
     purchase_details = PurchaseDetail.objects.filter(
-        purchaseHeader=purchase_header)
+        purchaseHeader=purchase_header).select_related("product")
 
     context = {
         'purchase_header': purchase_header,
@@ -373,8 +557,8 @@ def cart_detail(request):
         # ✅ Debugging: Print cart items
         print(f"🛒 Debug: Cart contains {len(cart_items)} items for user {request.user.username}")
 
-        # ✅ AI-Powered Recommendations
-        recommended_products = recommend_products_for_user(request.user)
+        # ✅ AI-Powered Recommendations (precomputed, refreshed on checkout)
+        recommended_products = stored_recommendations(cart_customer)
 
         # ✅ Debugging: Check if recommendations exist
         if recommended_products:
@@ -385,7 +569,8 @@ def cart_detail(request):
         return render(request, 'cart_detail.html', {
             'cart': cart,
             'cart_items': cart_items,
-            'recommended_products': recommended_products  # ✅ Pass to template
+            'recommended_products': recommended_products,  # ✅ Pass to template
+            'checkout_token': uuid.uuid4().hex,  # ✅ Idempotency key for this checkout form
         })
 
     except Customer.DoesNotExist:
@@ -407,9 +592,15 @@ def edit_cart_item(request, cart_item_id):
     if request.method == 'POST':
         form = CartItemForm(request.POST, instance=cart_item)
         if form.is_valid():
-            form.save()  # Save the updated quantity and line total
-            cart_item.cart.save()  # Recalculate the cart total
-            return redirect('cart_detail')
+            try:
+                # ✅ Hold the new quantity against stock before saving it
+                reserve(cart_item.cart, cart_item.product, form.cleaned_data['qty'])
+            except InsufficientStock as e:
+                form.add_error('qty', str(e))
+            else:
+                form.save()  # Save the updated quantity and line total
+                recalculate_cart_totals(cart_item.cart)  # Recalculate the cart total
+                return redirect('cart_detail')
     else:
         form = CartItemForm(instance=cart_item)
 
@@ -423,7 +614,8 @@ def delete_cart_item(request, cart_item_id):
 
     if request.method == "POST":  # Confirm deletion via POST request
         cart_item.delete()  # Remove cart item
-        cart_item.cart.save()  # Recalculate the cart total
+        release(cart_item.cart, cart_item.product)  # Free the held stock
+        recalculate_cart_totals(cart_item.cart)  # Recalculate the cart total
         return redirect('cart_detail')
 
     return render(request, 'cart_confirm_delete.html', {'cart_item': cart_item})
@@ -434,36 +626,16 @@ def checkout(request):
     """Handles checkout process and finalizes the order."""
     try:
         customer = Customer.objects.get(user=request.user)
-        cart = Cart.objects.get(customer=customer)
-
-        if cart.items.count() == 0:
-            messages.error(request, "Your cart is empty!")
-            return redirect('cart_detail')
-
-        # Create a purchase record
-        purchase = PurchaseHeader.objects.create(
-            customer=customer,
-            total=cart.total,
-            discount=cart.discount
-        )
-
-        # Move cart items to purchase details
-        for item in cart.items.all():
-            PurchaseDetail.objects.create(
-                purchaseHeader=purchase,
-                product=item.product,
-                description=item.product.description,
-                qty=item.qty,
-                price=item.price,
-                discount=item.discount,
-                line_total=item.line_total
-            )
-
-        # Clear cart
-        cart.items.all().delete()
-        cart.total = 0
-        cart.discount = 0
-        cart.save()
+
+        # ✅ Retries carrying the same key replay the original order instead of placing another
+        idempotency_key = (
+            request.headers.get("Idempotency-Key") or request.POST.get("idempotency_key") or None)
+
+        # ✅ One transaction: lock stock, decrement it, bulk-insert details, clear cart
+        checkout_cart(customer, idempotency_key=idempotency_key)
+
+        # ✅ New purchases change this customer's recommendations
+        refresh_customer_recommendations(customer)
 
         messages.success(
             request, "Purchase successful! Your order has been placed.")
@@ -473,6 +645,14 @@ def checkout(request):
         messages.error(request, "No customer profile found.")
         return redirect('profile')
 
+    except Cart.DoesNotExist:
+        messages.error(request, "Your cart is empty!")
+        return redirect('cart_detail')
+
+    except CheckoutError as e:
+        messages.error(request, str(e))
+        return redirect('cart_detail')
+
 
 @login_required
 def add_to_cart(request, product_id):  
@@ -491,26 +671,9 @@ def add_to_cart(request, product_id):
             # ✅ Ensure cart exists
             cart, created = Cart.objects.get_or_create(
                 customer=cart_customer, defaults={'discount': 0, 'total': 0})
-            cart.save()
 
-            # ✅ Check if the product is already in the cart
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'qty': 1, 'price': product.price, 'discount': 0}
-            )
-
-            if not created:
-                cart_item.qty += 1
-                cart_item.save()
-
-            # ✅ Recalculate cart total
-            total = sum(item.price * item.qty for item in cart.items.all())
-            discount = sum(item.discount for item in cart.items.all())
-
-            cart.total = total
-            cart.discount = discount
-            cart.save()
+            # ✅ Atomic add: increments in SQL, so concurrent clicks are never lost
+            add_product_to_cart(cart, product)
 
             return JsonResponse({"success": True, "total": cart.total, "discount": cart.discount})
 
@@ -529,13 +692,16 @@ def update_cart_quantity(request, cart_item_id):
             new_qty = data.get("qty")
 
             if new_qty and int(new_qty) > 0:
+                try:
+                    reserve(cart_item.cart, cart_item.product, int(new_qty))
+                except InsufficientStock as e:
+                    return JsonResponse({"error": str(e)}, status=400)
+
                 cart_item.qty = int(new_qty)
                 cart_item.save()
 
                 # ✅ Update cart total
-                cart = cart_item.cart
-                cart.total = sum(item.qty * item.price for item in cart.items.all())
-                cart.save()
+                cart = recalculate_cart_totals(cart_item.cart)
 
                 return JsonResponse({"success": True, "new_total": cart_item.qty * cart_item.price, "cart_total": cart.total})
 
@@ -556,10 +722,10 @@ def remove_cart_item(request, cart_item_id):
             cart = cart_item.cart
 
             cart_item.delete()
+            release(cart, cart_item.product)
 
             # ✅ Update cart total
-            cart.total = sum(item.qty * item.price for item in cart.items.all())
-            cart.save()
+            recalculate_cart_totals(cart)
 
             return JsonResponse({"success": True, "cart_total": cart.total})
 
@@ -602,6 +768,7 @@ def submit_feedback(request, product_id):
                 feedback.customer = customer
                 feedback.product = product
                 feedback.save()
+                feedback_scoring.enqueue()  # ✅ Scored in the background; the request doesn't wait for the model
 
                 return JsonResponse({"success": "✅ Thank you for your feedback!"})
             else:
@@ -614,16 +781,72 @@ def submit_feedback(request, product_id):
     return JsonResponse({"error": "❌ Invalid request method."}, status=405)
 
 
+def _latest_feedback(product, cursor=None, page_size=FEEDBACK_PAGE_SIZE):
+    """One keyset page of a product's feedback, newest first, with authors joined in."""
+    feedbacks = Feedback.objects.filter(product=product).select_related("customer__user").only(
+        "id", "comments", "sentiment", "created_at", "customer__user__username")
+    # ✅ Seeks along the (product, created_at, id) index, so deep pages cost the same as the first
+    return keyset_paginate(feedbacks, ["-created_at", "-id"], cursor=cursor, page_size=page_size)
+
+
+def _feedback_page(request, product):
+    """The feedback page selected by the request's ``after`` and ``page_size`` parameters."""
+    return _latest_feedback(
+        product, cursor=request.GET.get("after"),
+        page_size=clamp_page_size(request.GET.get("page_size"), default=FEEDBACK_PAGE_SIZE))
+
+
 @login_required
 def view_feedback(request, product_id):
-    """View feedback for a specific product."""
-    product = get_object_or_404(Product, id=product_id)
+    """View feedback for a specific product, one page at a time."""
+    product = get_object_or_404(Product.objects.select_related("review_stats"), id=product_id)
+    try:
+        page = _feedback_page(request, product)
+    except InvalidCursor:
+        return redirect("view_feedback", product_id=product.id)
+
+    return render(request, "feedback/view_feedback.html", {
+        "product": product,
+        "feedbacks": page.items,
+        "next_cursor": page.next_cursor,
+    })
 
-    feedbacks = Feedback.objects.filter(product=product).order_by("-created_at")  # ✅ Sorting latest first
 
-    return render(request, "feedback/view_feedback.html", {"product": product, "feedbacks": feedbacks})
+@login_required
+def product_feedback_feed(request, product_id):
+    """JSON page of a product's feedback for lazy loading; follow ``next`` until it is null."""
+    product = get_object_or_404(Product.objects.only("id"), id=product_id)
+    try:
+        page = _feedback_page(request, product)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    next_url = None
+    if page.has_next:
+        next_url = f"{reverse('product_feedback_feed', args=[product.id])}?{urlencode({'after': page.next_cursor})}"
+
+    return JsonResponse({
+        "feedback": [
+            {
+                "id": feedback.id,
+                "username": feedback.customer.user.username,
+                "comments": feedback.comments,
+                "sentiment": feedback.sentiment,
+                "created_at": feedback.created_at.isoformat(),
+            }
+            for feedback in page.items
+        ],
+        "next": next_url,
+    })
+
 
 def product_detail(request, product_id):
-    """View details of a product."""
-    product = get_object_or_404(Product, id=product_id)
-    return render(request, "products/product_details.html", {"product": product})
+    """View details of a product with its latest feedback."""
+    product = get_object_or_404(Product.objects.select_related("review_stats"), id=product_id)
+    # ✅ Fixed-size preview; paging parameters belong to view_feedback, not this page
+    page = _latest_feedback(product, page_size=PRODUCT_FEEDBACK_PREVIEW)
+    return render(request, "products/product_details.html", {
+        "product": product,
+        "feedbacks": page.items,
+        "more_feedback": page.has_next,
+    })